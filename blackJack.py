@@ -8,9 +8,10 @@ More info at: https://en.wikipedia.org/wiki/Blackjack
 Tag: Game
 """
 
-import random, sys, os
-from dataclasses import dataclass
-from typing import List, Optional
+import math, random, struct, sys, shutil
+from array import array
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Generator, List, Optional, Tuple
 
 RULES = """
 Blackjack, by Ede Chinedu
@@ -20,7 +21,7 @@ Blackjack, by Ede Chinedu
     -> Aces are worth 1 or 11 points.
     -> Cards 2 through 10 are worth their face value.
     -> In case of a tie, the bet is returned to the player.
-    -> The dealer stops hitting at 17.
+{table_rules}
     
     Commands:
     -> (H)it to take another card.
@@ -29,32 +30,54 @@ Blackjack, by Ede Chinedu
         bet on initial hand. Available on first play if both cards are
         equal by rank.
     -> (D)ouble down to increase your bet but must hit exactly one
-        more time before standing (available on first play).
+        more time before standing (available on first play).{table_commands}
 	"""
 
 
-@dataclass(repr=True)
-class Suits:
-    """A class representing the four types of suits of cards: spade,
-    club, hearts, diamonds.
-    
-    :card_type -> The str representation of the card suite."""
-    card_type: str
-    
+def rules_text(rules: 'Rules') -> str:
+    """Returns RULES with the lines and commands that depend on the
+    table rules filled in.
+
+    :rules -> The table rules."""
+    lines = ["The dealer hits a soft 17 and stops at any other 17." if rules.hit_soft_17
+        else "The dealer stops hitting at 17."]
+    if rules.blackjack_pays is not None:
+        lines.append("A blackjack, an ace and a ten card dealt together, pays "
+            "{} to {}.".format(*rules.blackjack_pays))
+    if rules.double_on is not None:
+        lines.append("Doubling down is only allowed on a hard {} to {}.".format(*rules.double_on))
+    if rules.double_after_split:
+        lines.append("Split hands may double down.")
+    if rules.max_hands != 2:
+        lines.append(f"Hands can be split into up to {rules.max_hands} hands."
+            if rules.max_hands > 2 else "Hands can't be split.")
+    if rules.surrender:
+        lines.append("Surrender is early, the dealer doesn't check for blackjack first.")
+    commands = ("\n    -> (R)surrender to give up the hand for half the bet back\n"
+        "        (available on first play)." if rules.surrender else '')
+    return RULES.format(table_rules='\n'.join(f"    -> {line}" for line in lines),
+        table_commands=commands)
+
 
 class Card:
-    """Class representing a card"""
+    """Class representing a card. Cards are immutable, only the 52 in
+    CARDS are ever made and every deck of cards references them."""
+
+    __slots__ = ('rank', 'suit', 'value')
 
-    def __init__(self, rank: int, suit: Suits, value: int) -> None:
+    def __init__(self, rank: int, suit: str, value: int) -> None:
         """Initializes the values of the card.
         
         :rank -> The number value of the card
-        :suit -> The suit class: heats, spades, diamonds or clubs
+        :suit -> The suit symbol: heats, spades, diamonds or clubs
         :value -> The number value the card represents"""
 
-        self.rank = rank
-        self.suit = suit
-        self.value = value
+        object.__setattr__(self, 'rank', rank)
+        object.__setattr__(self, 'suit', suit)
+        object.__setattr__(self, 'value', value)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"Card is immutable, cannot set {name!r}")
 
     def get_string_repr(self) -> str:
         """Returns the string representation of a card."""
@@ -65,24 +88,109 @@ class Card:
         result += f"|_{r_.rjust(2, '_')}|"
         return result
 
+    @classmethod
+    def from_code(cls, code: int) -> 'Card':
+        """Returns the card a code stands for, the one in CARDS.
+
+        :code -> Card code from 0 to 51."""
+        return CARDS[code]
+
+    def __reduce__(self) -> tuple:
+        # copies and unpickled cards are the flyweight itself
+        return Card.from_code, (CARDS.index(self),)
+
     def __repr__(self) -> str:
         return f"Card({self.rank}, {self.suit})"
 
 
-def make_cards() -> list:
-    """A function that makes a deck of cards, randomizes and returns it."""
-    cards = []          #holds the deck of cards
-    suits = [Suits(chr(9824)), Suits(chr(9827)), Suits(chr(9829)), Suits(chr(9830))]        #holds all suits
-    for suit in suits:
-        for rank in range(2, 11):       
-            cards.append(Card(rank, suit.card_type, rank))      #appends appropriate cards to deck
-        for rank in ('J', 'Q', 'K'):
-            cards.append(Card(rank, suit.card_type, 10))
-        cards.append(Card('A', suit.card_type, 1))
-    
-    random.shuffle(cards)     #randomize cards
+# A card is encoded as a small integer, code = suit * 13 + rank index, so
+# a deck is just an array('B') of codes in 0..51. Ranks run in the order
+# make_cards always dealt them in: 2-10, J, Q, K, A.
+RANKS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 'J', 'Q', 'K', 'A')        #rank of a code, RANKS[code % 13]
+SUITS = (chr(9824), chr(9827), chr(9829), chr(9830))           #suit of a code, SUITS[code // 13]
+VALUES = bytes((2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 1) * 4)  #value of a code, VALUES[code]
+ACE = 12                                                       #rank index of the ace
+FULL_DECK = array('B', range(52))                               #an unshuffled deck of codes
+#the only 52 Card objects, indexed by code
+CARDS = tuple(Card(RANKS[code % 13], SUITS[code // 13], VALUES[code]) for code in FULL_DECK)
+# every card's art rendered once, one tuple of lines per code
+CARD_ART = tuple(tuple(card.get_string_repr().split('\n')) for card in CARDS)
+HIDDEN_ART = (" ___ ", "|## |", "|###|", "|_##|")      #used for dealer entity to hide card
+
+
+def make_cards(rng: Optional[random.Random] = None) -> list:
+    """A function that makes a deck of cards, randomizes and returns it.
+
+    :rng -> Random generator used to shuffle, defaults to the random module."""
+    cards = list(CARDS)         #holds the deck of cards
+    (rng or random).shuffle(cards)       #randomize cards
     return cards
 
+
+class Shoe:
+    """A shoe holding one or more decks of card codes. Cards are dealt
+    from the front until the cut card is reached, only then does the
+    shoe have to be reshuffled."""
+
+    __slots__ = ('decks', 'penetration', 'rng', 'cards', 'pos', 'cut')
+
+    def __init__(self, decks: int = 6, penetration: float = 0.75,
+        rng: Optional[random.Random] = None) -> None:
+        """Initializes and shuffles the shoe.
+
+        :decks -> Number of decks in the shoe, 1 to 8.
+        :penetration -> Fraction of the shoe dealt before the cut card
+            comes out, 0 reshuffles every round.
+        :rng -> Random generator used to shuffle, defaults to the random
+            module."""
+        if not 1 <= decks <= 8:
+            raise ValueError(f"A shoe holds 1 to 8 decks, not {decks}.")
+        if not 0 <= penetration < 1:
+            raise ValueError(f"Penetration must be from 0 up to 1, not {penetration}.")
+        self.decks = decks
+        self.penetration = penetration
+        self.rng = rng                                  #None shuffles with the random module
+        self.cards = array('B', FULL_DECK * decks)     #the cards in dealing order
+        self.shuffle()
+
+    def shuffle(self) -> None:
+        """Gathers every card back into the shoe, shuffles it and
+        places the cut card."""
+        self.cards[:] = FULL_DECK * self.decks
+        (self.rng or random).shuffle(self.cards)
+        self.pos = 0                                    #index of the next card to deal
+        self.cut = int(len(self.cards) * self.penetration)
+
+    def deal(self) -> int:
+        """Removes the next card from the shoe and returns its code."""
+        if self.pos == len(self.cards):
+            # Only happens if a round outlasts the cards behind the
+            # cut card. Freshly shuffled decks go behind the dealt cards
+            # so the round can still be finished, the next shuffle
+            # gathers them back in.
+            extra = FULL_DECK * self.decks
+            (self.rng or random).shuffle(extra)
+            self.cards.extend(extra)
+        card = self.cards[self.pos]
+        self.pos += 1
+        return card
+
+    def cut_reached(self) -> bool:
+        """Returns True once the cut card has come out."""
+        return self.pos >= self.cut
+
+    def composition(self) -> Tuple[int, ...]:
+        """Returns how many cards of each value, ace (1) through ten,
+        are left to deal."""
+        counts = [0] * 10
+        for card in self.cards[self.pos:]:
+            counts[VALUES[card] - 1] += 1
+        return tuple(counts)
+
+    def __len__(self) -> int:
+        return len(self.cards) - self.pos
+
+
 def roundup(x: int) -> int:
     """Roundup to the next hundred.
     
@@ -94,11 +202,13 @@ def roundup(x: int) -> int:
 class Entity:
     """A base class from which the dealer class and player class inherit
     from. An entity could be a player or dealer."""
-    
-    def __init__(self, hand: List[Card], limit: int, name: str) -> None:
+
+    __slots__ = ('hand', 'limit', 'name', 'hard', 'aces', 'soft', 'pair')
+
+    def __init__(self, hand: List[int], limit: int, name: str) -> None:
         """Initializes the class with necessary attributes.
         
-        :hand -> The player/dealers hand, initialized with two cards.
+        :hand -> The player/dealers hand of card codes, initialized with two cards.
         :limit -> Limit above which the entity cannot draw again
         :name -> name of player or "dealer" if entity is a dealer"""
 
@@ -106,29 +216,61 @@ class Entity:
         self.limit = limit      
         self.name = name        
 
+        # Running totals kept up to date by add_card/pop_card
+        # so the value of the hand never has to be recounted.
+        self.hard = 0           #value of the hand with every ace worth 1
+        self.aces = 0           #number of aces in the hand
+        for card in hand:
+            self.hard += VALUES[card]
+            if card % 13 == ACE:
+                self.aces += 1
+        self._update_flags()
+
+    def _update_flags(self) -> None:
+        """Recomputes the soft and pair flags from the running totals."""
+        # An ace can only be worth 11 if it doesn't take the
+        # hand over 21, and only one ace ever can be.
+        self.soft = self.aces > 0 and self.hard + 10 <= 21
+        self.pair = len(self.hand) == 2 and self.hand[0] % 13 == self.hand[1] % 13
+
+    def reset(self, cards: Tuple[int, ...] = ()) -> None:
+        """Empties the hand in place, then gives it the cards.
+
+        :cards -> Codes of the cards of the new hand."""
+        self.hand.clear()
+        self.hard = 0
+        self.aces = 0
+        for card in cards:
+            self.hand.append(card)
+            self.hard += VALUES[card]
+            if card % 13 == ACE:
+                self.aces += 1
+        self._update_flags()
+
+    def add_card(self, card: int) -> None:
+        """Adds a card to the entity's hand.
+
+        :card -> Code of the card to add."""
+        self.hand.append(card)
+        self.hard += VALUES[card]
+        if card % 13 == ACE:
+            self.aces += 1
+        self._update_flags()
+
+    def pop_card(self) -> int:
+        """Removes the last card from the entity's hand and returns it."""
+        card = self.hand.pop()
+        self.hard -= VALUES[card]
+        if card % 13 == ACE:
+            self.aces -= 1
+        self._update_flags()
+        return card
+
     def get_hand_value(self) -> int:
         """Returns the value of the cards. Face cards are worth 10, aces are
 	    worth 11 or 1 (this function picks the most suitable ace value)."""
 
-        aces_count =  0        #initializes aces_count, used to determine if 10 will be added l8r.
-        value = 0              #accumulative value to be returned
-        for card in self.hand:
-            # loop through each card in the given hand
-            # access their value attributes and add to
-            # accum. if card is an ace, 'A', increment
-            # count.
-            if card.rank == 'A':
-                aces_count += 1
-            value += card.value
-
-        for _ in range(aces_count):
-            #loop through the number of aces and 
-            #if possible add 10 provided it doesn't
-            # go over limit.
-            if value + 10 <= self.limit:
-                value += 10
-
-        return value
+        return self.hard + 10 if self.soft else self.hard
 
     def show_all_cards(self, hide_first: bool = False) -> str:
         """Utility method used to print the entity's cards to
@@ -137,63 +279,614 @@ class Entity:
         :hide_first -> If True, it shows the value of the first card,
             useful for hiding the dealer's card."""
 
-        hidden_card = " ___ \n|## |\n|###|\n|_##|"      #used for dealer entity to hide card
-        # Loop through entity's hand and split according
-        # to newline. without that, cards would be printed
-        # vertically instead of side-by-side.
-        card_split = [ card.get_string_repr().split('\n') 
-            for card in self.hand]
+        # Each card's art is already split into lines, without
+        # that cards would be printed vertically instead of
+        # side-by-side.
+        card_split = [CARD_ART[card] for card in self.hand]
         #hide first card if dealer chooses it
-        if hide_first: card_split[0] = hidden_card.split('\n')      
-
-        all_cards_str = ''                      #accumulator for total str representation of the entity's hand
-        # loop through the no of lines each
-        # card string would take
-        for i in range(len(card_split[0])):
-            #loop through each card in hand
-            for card in card_split:
-                all_cards_str += card[i] + "  "         #add card line by line seperated by space.
-            all_cards_str += '\n'
-        return all_cards_str
+        if hide_first: card_split[0] = HIDDEN_ART
+
+        # zip lines up the cards row by row, add card line by
+        # line seperated by space.
+        return ''.join('  '.join(line) + '  \n' for line in zip(*card_split))
 
 class Dealer(Entity):
     """A Dealer class which inherits from Entity."""
 
-    def __init__(self, hand: List[Card]) -> None:
+    __slots__ = ()
+
+    def __init__(self, hand: List[int]) -> None:
         """Initializes necessary variables."""
-        super().__init__(hand, limit=17, name = "Dealer")
+        super().__init__(hand, limit=DEALER_STANDS, name = "Dealer")
 
 
 class Player(Entity):
     """A player class which inherits from Entity."""
-    def __init__(self, hand: List[Card], money: int, name: str) -> None:
+
+    __slots__ = ('money', 'surrendered')
+
+    def __init__(self, hand: List[int], money: int, name: str) -> None:
         """Initializes necessary variables.
         
         :money -> The bet placed by the player"""
-        super().__init__(hand, name=name, limit=21)
+        super().__init__(hand, name=name, limit=BLACKJACK)
         self.money = money
+        self.surrendered = False
+
+    def reset(self, cards: Tuple[int, ...] = ()) -> None:
+        super().reset(cards)
+        self.money = 0
+        self.surrendered = False
+
+    def is_live(self) -> bool:
+        """Returns True if the hand is neither bust nor surrendered, so
+        the dealer has to play against it."""
+        return not self.surrendered and self.get_hand_value() <= self.limit
 
     
+MOVE_NAMES = {'H': '(H)it', 'S': '(S)tand', 'D': '(D)ouble down', 'X': '(X)split',
+    'R': '(R)surrender'}
+# legal moves of a two card hand, indexed by can double + 2 * can
+# split + 4 * can surrender
+LEGAL_MOVES = tuple('HS' + 'D' * (i & 1) + 'X' * (i >> 1 & 1) + 'R' * (i >> 2) for i in range(8))
+HAND_NAMES = ('', ' hand_two', ' hand_three', ' hand_four')     #suffix of each hand's name
+MAX_HANDS = len(HAND_NAMES)                                     #hands a player can split into
+BLACKJACK = 21                  #best hand value, a hand worth more goes bust
+DEALER_STANDS = 17              #lowest total the dealer stands on
+TOTALS = 32                     #room in a lookup table indexed by hand value
+
+
+@dataclass(frozen=True)
+class Rules:
+    """A variant of the table rules. The defaults are the rules this
+    game has always had. A BlackJack turns its rules into lookup tables
+    when it is made, so no rule is looked at again during a round.
+
+    :decks -> Number of decks in the shoe, 1 to 8.
+    :hit_soft_17 -> True if the dealer hits a soft 17 (H17), False if
+        the dealer stands on every 17 (S17).
+    :double_after_split -> True if split hands may double down (DAS).
+    :max_hands -> Hands a player may split into, 1 to MAX_HANDS. 1
+        forbids splitting, 2 allows one split, more allow resplitting.
+    :surrender -> True if a player may surrender their first two cards
+        for half the bet back, before splitting. The dealer doesn't peek,
+        so this is early surrender, a hand can be given up against a
+        natural.
+    :blackjack_pays -> (win, bet) a natural pays, e.g. (3, 2). A natural
+        then beats any other 21, and a dealer's natural beats any hand
+        that isn't one. None plays a natural as an ordinary 21.
+    :double_on -> (lowest, highest) hard total a player may double on,
+        e.g. (9, 11). None allows doubling on any two cards."""
+    decks: int = 6
+    hit_soft_17: bool = False
+    double_after_split: bool = False
+    max_hands: int = 2
+    surrender: bool = False
+    blackjack_pays: Optional[Tuple[int, int]] = None
+    double_on: Optional[Tuple[int, int]] = None
+
+    def __post_init__(self) -> None:
+        if not 1 <= self.decks <= 8:
+            raise ValueError(f"A shoe holds 1 to 8 decks, not {self.decks}.")
+        if not 1 <= self.max_hands <= MAX_HANDS:
+            raise ValueError(f"A player can play 1 to {MAX_HANDS} hands, not {self.max_hands}.")
+        if self.blackjack_pays is not None and not (self.blackjack_pays[0] > 0 < self.blackjack_pays[1]):
+            raise ValueError(f"A natural can't pay {self.blackjack_pays[0]} to {self.blackjack_pays[1]}.")
+        if self.double_on is not None and self.double_on[0] > self.double_on[1]:
+            raise ValueError(f"Doubling on {self.double_on[0]} to {self.double_on[1]} allows no total.")
+
+    @property
+    def key(self) -> str:
+        """Short name of the rules, e.g. '6d-s17-split1-nodas-noes-nobj-dany'.
+        parse_rules turns it back into the rules."""
+        bj = 'bj{}to{}'.format(*self.blackjack_pays) if self.blackjack_pays else 'nobj'
+        double = 'd{}to{}'.format(*self.double_on) if self.double_on else 'dany'
+        return '-'.join((f"{self.decks}d", 'h17' if self.hit_soft_17 else 's17',
+            f"split{self.max_hands - 1}", 'das' if self.double_after_split else 'nodas',
+            'es' if self.surrender else 'noes', bj, double))
+
+    @property
+    def whole_bet(self) -> int:
+        """Smallest bet that naturals and surrenders pay in whole money,
+        any multiple of it does too. Smaller bets are rounded down in the
+        house's favour, e.g. a 3:2 natural on a bet of 1 pays 1."""
+        bet = 1
+        if self.blackjack_pays is not None:
+            bet = self.blackjack_pays[1] // math.gcd(*self.blackjack_pays)
+        if self.surrender:
+            bet = bet * 2 // math.gcd(bet, 2)
+        return bet
+
+    def dealer_hits(self) -> Tuple[Tuple[bool, ...], Tuple[bool, ...]]:
+        """Returns whether the dealer hits each hand value, indexed
+        [soft][value]."""
+        hard = tuple(value < DEALER_STANDS for value in range(TOTALS))
+        soft = tuple(value < DEALER_STANDS or self.hit_soft_17 and value == DEALER_STANDS
+            for value in range(TOTALS))
+        return hard, soft
+
+    def doubles(self) -> Tuple[Tuple[bool, ...], Tuple[bool, ...]]:
+        """Returns whether a two card hand may be doubled on each hand
+        value, indexed [soft][value]. Restricted doubling is on hard
+        totals only."""
+        if self.double_on is None:
+            return (True,) * TOTALS, (True,) * TOTALS
+        low, high = self.double_on
+        return tuple(low <= value <= high for value in range(TOTALS)), (False,) * TOTALS
+
+
+NO_DOUBLES = ((False,) * TOTALS,) * 2           #Rules.doubles of a hand that may never double
+
+
+def parse_rules(text: str, rules: Rules = Rules()) -> Rules:
+    """Turns rules written like Rules.key, e.g. 'h17-das-split3-bj3to2',
+    into Rules. Settings that aren't mentioned are taken from rules.
+
+    :text -> The settings, separated by '-' or ','.
+    :rules -> Rules to change."""
+    changes = {}
+    for token in text.replace(',', '-').lower().split('-'):
+        if not token:
+            continue
+        if token in ('s17', 'h17'):
+            changes['hit_soft_17'] = token == 'h17'
+        elif token in ('das', 'nodas'):
+            changes['double_after_split'] = token == 'das'
+        elif token in ('es', 'noes'):
+            changes['surrender'] = token == 'es'
+        elif token == 'nobj':
+            changes['blackjack_pays'] = None
+        elif token == 'dany':
+            changes['double_on'] = None
+        elif token.endswith('d') and token[:-1].isdigit():
+            changes['decks'] = int(token[:-1])
+        elif token.startswith('split') and token[5:].isdigit():
+            changes['max_hands'] = int(token[5:]) + 1
+        elif token.startswith(('bj', 'd')) and 'to' in token:
+            low, _, high = token.lstrip('bjd').partition('to')
+            if not (low.isdigit() and high.isdigit()):
+                raise ValueError(f"Unknown rule {token!r}.")
+            changes['blackjack_pays' if token.startswith('bj') else 'double_on'] = (int(low), int(high))
+        else:
+            raise ValueError(f"Unknown rule {token!r}.")
+    return replace(rules, **changes)
+
+
+def _silent(*args, **kwargs) -> None:
+    """Stand-in for print when the game runs headless."""
+
+
+class Policy:
+    """Base class for a decision policy. A policy makes every decision
+    the player would otherwise type in at the console, which lets a
+    round be played without any terminal I/O."""
+
+    def bet(self, entity: Player, amt: int) -> int:
+        """Returns the amount to stake.
+
+        :entity -> The player placing the bet.
+        :amt -> The maximum amount allowed to bet."""
+        raise NotImplementedError
+
+    def move(self, entity: Entity, upcard: int, moves: str) -> str:
+        """Returns the chosen move, one of the letters in moves.
+
+        :entity -> Player/split_hand whose turn it is.
+        :upcard -> Code of the dealer's face up card.
+        :moves -> The legal moves, e.g. 'HSDX'."""
+        raise NotImplementedError
+
+    def pause(self) -> None:
+        """Called whenever the game waits for the player to catch up."""
+
+
+class ConsolePolicy(Policy):
+    """The interactive policy, every decision is read from the console."""
+
+    def __init__(self, echo: Callable[..., None] = print,
+        ask: Callable[[str], str] = input) -> None:
+        """Initializes necessary variables.
+
+        :echo -> Function used to print prompts and errors.
+        :ask -> Function used to read the player's answer."""
+        self.echo = echo
+        self.ask = ask
+
+    def bet(self, entity: Player, amt: int) -> int:
+        """Asks the user to input an amount to bet or quits the
+        game entirely."""
+        while True:                             #loop until player enters a valid amount.
+            try:
+                self.echo(f"Enter an amount from $1 - ${amt} or press (Q)uit.")
+                money_to_bet = self.ask('> ').strip().upper()
+                if money_to_bet == 'Q':
+                    self.echo("Thanks for playing.")
+                    self.echo("..or maybe you can't actually play :)")
+                    sys.exit()                  #exits game.
+
+                money_to_bet = int(money_to_bet)
+                if 1 <= money_to_bet <= amt:
+                    return money_to_bet         #money within reasonable range
+                self.echo("Amount not within range.\n")
+            except ValueError:
+                self.echo("Enter a valid amount.\n")        #Ask again, invalid input
+
+    def move(self, entity: Entity, upcard: int, moves: str) -> str:
+        """Asks the user for a move until a legal one is entered."""
+        prompt = ', '.join(MOVE_NAMES[m] for m in moves) + '> '
+        while True:             #ask player until player returns a valid move.
+            player_choice = self.ask(prompt).strip().upper()
+            if len(player_choice) == 1 and player_choice in moves:
+                return player_choice
+            self.echo("Enter a valid choice.")
+
+    def pause(self) -> None:
+        self.ask("Press Enter to continue...")
+
+
+class SimplePolicy(Policy):
+    """A headless policy that bets a flat amount and, like the dealer,
+    hits until its hand reaches stand_on."""
+
+    def __init__(self, unit: int = 10, stand_on: int = 17) -> None:
+        """Initializes necessary variables.
+
+        :unit -> The amount staked every round.
+        :stand_on -> Hand value at which the policy stops hitting."""
+        self.unit = unit
+        self.stand_on = stand_on
+
+    def bet(self, entity: Player, amt: int) -> int:
+        return min(self.unit, amt)
+
+    def move(self, entity: Entity, upcard: int, moves: str) -> str:
+        return 'H' if entity.get_hand_value() < self.stand_on else 'S'
+
+
+# Basic strategy for the rules of this game: six decks, dealer stands on
+# 17 without peeking for blackjack, one split and no doubling after it,
+# as solved by blackJackStrategy.solve. Each row holds one move per dealer
+# upcard, 2 through 10 then the ace. H hit, S stand, D double or else hit,
+# d double or else stand, R surrender or else hit, r surrender or else
+# stand. Pair rows are keyed by card value (ace is 11),
+# X splits and - plays the pair by its hard or soft total instead.
+BASIC_STRATEGY = {
+    'hard': {
+        **{total: 'HHHHHHHHHH' for total in range(4, 9)},
+        9: 'HDDDDHHHHH',
+        10: 'DDDDDDDDHH',
+        11: 'DDDDDDDDHH',
+        12: 'HHSSSHHHHH',
+        **{total: 'SSSSSHHHHH' for total in range(13, 17)},
+        **{total: 'SSSSSSSSSS' for total in range(17, 22)},
+    },
+    'soft': {
+        12: 'HHHHHHHHHH',
+        13: 'HHHHDHHHHH',
+        14: 'HHHDDHHHHH',
+        15: 'HHDDDHHHHH',
+        16: 'HHDDDHHHHH',
+        17: 'HDDDDHHHHH',
+        18: 'SddddSSHHH',
+        **{total: 'SSSSSSSSSS' for total in range(19, 22)},
+    },
+    'pair': {
+        2: '--XXXX----',
+        3: '--XXXX----',
+        4: '----------',
+        5: '----------',
+        6: '-XXXX-----',
+        7: 'XXXXXX----',
+        8: 'XXXXXXXX--',
+        9: 'XXXXX-XX--',
+        10: '----------',
+        11: 'XXXXXXXXXX',
+    },
+}
+
+
+def upcard_index(card: int) -> int:
+    """Returns the strategy table column of a dealer upcard, 0 for a
+    two through 9 for an ace.
+
+    :card -> Code of the upcard."""
+    value = VALUES[card]
+    return 9 if value == 1 else value - 2
+
+
+def strategy_move(table: dict, entity: Entity, upcard: int, moves: str) -> str:
+    """Looks up the move a strategy table makes for a hand.
+
+    :table -> Strategy table laid out like BASIC_STRATEGY.
+    :entity -> The hand to play.
+    :upcard -> Code of the dealer's face up card.
+    :moves -> The legal moves, e.g. 'HSDX'."""
+    column = upcard_index(upcard)
+    if 'X' in moves:
+        value = VALUES[entity.hand[0]]
+        if table['pair'][11 if value == 1 else value][column] == 'X':
+            return 'X'
+    rows = table['soft'] if entity.soft else table['hard']
+    move = rows[entity.get_hand_value()][column]
+    if move == 'D':
+        return 'D' if 'D' in moves else 'H'
+    if move == 'd':
+        return 'D' if 'D' in moves else 'S'
+    if move == 'R':
+        return 'R' if 'R' in moves else 'H'
+    if move == 'r':
+        return 'R' if 'R' in moves else 'S'
+    return move
+
+
+def move_hints(table: dict, entity: Entity, upcard: int, moves: str,
+    natural: bool = False) -> Dict[str, float]:
+    """Looks up the expected value of each legal move for a hand, in
+    units of the bet, in the 'ev' tables of a solved strategy such as
+    blackJackStrategy.load_strategy returns.
+
+    :table -> Strategy table with its 'ev' tables.
+    :entity -> The hand to play.
+    :upcard -> Code of the dealer's face up card.
+    :moves -> The legal moves, e.g. 'HSDX'.
+    :natural -> True if the hand is a natural the rules pay, standing
+        on it is worth the natural's payout rather than a 21's."""
+    column = upcard_index(upcard)
+    ev = table['ev']
+    stand, hit, double = ev['soft' if entity.soft else 'hard'][entity.get_hand_value()][column]
+    if natural:
+        stand = ev['natural'][column]
+    hints = {'H': hit, 'S': stand, 'D': double, 'R': -0.5}
+    if 'X' in moves:
+        value = VALUES[entity.hand[0]]
+        hints['X'] = ev['pair'][11 if value == 1 else value][column]
+    return {move: hints[move] for move in moves}
+
+
+class StrategyPolicy(Policy):
+    """A headless policy that bets a flat amount and plays every hand
+    by a strategy table."""
+
+    def __init__(self, unit: int = 10, table: dict = BASIC_STRATEGY) -> None:
+        """Initializes necessary variables.
+
+        :unit -> The amount staked every round.
+        :table -> Strategy table laid out like BASIC_STRATEGY."""
+        self.unit = unit
+        self.table = table
+
+    def bet(self, entity: Player, amt: int) -> int:
+        return min(self.unit, amt)
+
+    def move(self, entity: Entity, upcard: int, moves: str) -> str:
+        return strategy_move(self.table, entity, upcard, moves)
+
+
+@dataclass
+class RoundResult:
+    """Record of a settled round, returned by BlackJack.play_round.
+
+    :bet -> The amount staked on the main hand.
+    :net -> Money won (positive) or lost (negative) over all hands.
+    :totals -> Final value of each hand played, the main hand first.
+    :dealer_total -> Final value of the dealer's hand.
+    :stakes -> Final stake of each hand, doubles included.
+    :payouts -> Money won or lost by each hand.
+    :cards -> Codes of every card dealt in the round, in dealing order.
+    :moves -> Letters of the moves picked, in the order they were made.
+    :dealer_cards -> Number of cards in the dealer's hand, the ones it
+        drew are the last cards of the round."""
+    bet: int
+    net: int
+    totals: Tuple[int, ...]
+    dealer_total: int
+    stakes: Tuple[int, ...]
+    payouts: Tuple[int, ...]
+    cards: bytes
+    moves: str
+    dealer_cards: int
+
+    @property
+    def player_total(self) -> int:
+        """Final value of the player's main hand."""
+        return self.totals[0]
+
+    @property
+    def split_total(self) -> Optional[int]:
+        """Final value of the second hand, None if no split."""
+        return self.totals[1] if len(self.totals) > 1 else None
+
+
+class TerminalRenderer:
+    """Draws the game on an ANSI terminal. The hands are kept in a table
+    at the top of the screen with the messages scrolling below it. The
+    last frame drawn is remembered so a repaint only rewrites the lines
+    that changed, and the screen is cleared with an escape code instead
+    of spawning a shell every round. On Windows the console's escape
+    code processing is turned on first with SetConsoleMode."""
+
+    def __init__(self, stream=None, read: Callable[[], str] = input,
+        height: Optional[int] = None) -> None:
+        """Initializes necessary variables.
+
+        :stream -> Where the frames are written, defaults to stdout.
+        :read -> Reads a line typed by the player.
+        :height -> Rows available, defaults to the terminal's height."""
+        self.stream = stream if stream is not None else sys.stdout
+        if sys.platform == "win32":
+            self._enable_escape_codes()
+        self.read = read
+        self.height = height
+        self.table: List[str] = []              #lines of the hands at the top
+        self.messages: List[str] = []           #lines printed below the table
+        self.frame: List[str] = []              #lines currently on the screen
+
+    @staticmethod
+    def _enable_escape_codes() -> None:
+        """Turns on escape code processing for the Windows console
+        stdout writes to, which legacy consoles leave off."""
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)                 #STD_OUTPUT_HANDLE
+        mode = ctypes.c_uint32()
+        if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):     #fails unless it is a console
+            kernel32.SetConsoleMode(handle, mode.value | 0x0004)    #ENABLE_VIRTUAL_TERMINAL_PROCESSING
+
+    def _rows(self) -> int:
+        """Number of rows the frame may use. The prompt takes the row
+        below it and the row after that is left free, so pressing Enter
+        never scrolls the screen."""
+        height = self.height or shutil.get_terminal_size().lines
+        return max(height - 2, len(self.table) + 1)
+
+    def paint(self, prompt: str = '') -> None:
+        """Repaints the lines that changed since the last frame and
+        leaves the cursor after the prompt on the line below the frame.
+
+        :prompt -> Text to show on the prompt line."""
+        room = self._rows() - len(self.table)
+        if len(self.messages) > room:
+            # Rather than scroll, and so rewrite, every message line
+            # on each new one, make room for half a screen at once.
+            del self.messages[:len(self.messages) - max(room // 2, 1)]
+        frame = self.table + self.messages
+        out = []
+        for row, line in enumerate(frame):
+            if row >= len(self.frame) or self.frame[row] != line:
+                out.append(f"\x1b[{row + 1};1H{line}\x1b[K")
+        for row in range(len(frame), len(self.frame) + 1):
+            out.append(f"\x1b[{row + 1};1H\x1b[K")          #erase leftover lines
+        out.append(f"\x1b[{len(frame) + 1};1H{prompt}")
+        self.frame = frame
+        self.stream.write(''.join(out))
+        self.stream.flush()
+
+    def echo(self, *args, sep: str = ' ', end: str = '\n') -> None:
+        """Drop in replacement for print, adds the text below the table."""
+        text = sep.join(str(arg) for arg in args) + end
+        if text.endswith('\n'):
+            text = text[:-1]
+        self.messages.extend(text.split('\n'))
+        self.paint()
+
+    def ask(self, prompt: str) -> str:
+        """Drop in replacement for input, asks on the line below the frame.
+
+        :prompt -> Text shown before the player's answer."""
+        self.paint(prompt)
+        answer = self.read()
+        self.messages.append(prompt + answer)     #the answer stays on screen
+        self.frame.append(prompt + answer)
+        return answer
+
+    def show_table(self, lines: List[str]) -> None:
+        """Replaces the table of hands at the top of the screen.
+
+        :lines -> The new table."""
+        self.table = list(lines)
+        self.paint()
+
+    def clear(self) -> None:
+        """Clears the screen and forgets the table and messages."""
+        self.table.clear()
+        self.messages.clear()
+        self.frame.clear()
+        self.stream.write("\x1b[2J\x1b[H")
+        self.stream.flush()
+
+
+# Layout of a snapshot header: version, start_amount, number of hands
+# in play, decks, cards left before the cut card, cards left in the shoe,
+# shoe penetration, then the number of cards in the dealer's hand and
+# the length of the name. The bet and number of cards of each hand in
+# play follow, the top bit of the number of cards set if the hand was
+# surrendered, then the name and the card codes.
+SNAPSHOT = struct.Struct('<BqBBhHfBB')
+SNAPSHOT_HAND = struct.Struct('<IB')
+SNAPSHOT_VERSION = 3
+SURRENDERED = 0x80
+
+
 class BlackJack:
     """A class representing a game of Blackjack."""
 
-    def __init__(self, player_name: str) -> None:
+    def __init__(self, player_name: str, policy: Optional[Policy] = None,
+        start_amount: Optional[int] = None,
+        echo: Optional[Callable[..., None]] = None,
+        shoe: Optional[Shoe] = None,
+        rng: Optional[random.Random] = None,
+        renderer: Optional['TerminalRenderer'] = None,
+        record: Optional[Callable[[RoundResult], None]] = None,
+        hints: Optional[dict] = None,
+        rules: Rules = Rules()) -> None:
         """Initializes necessary variable.
         
-        :player_name -> For a friendlier interface."""
-        self.start_amount = roundup(random.randint(1_000, 10_000) )               #randomized amount in $ to start the game
-        self.deck = make_cards()                                         #initialize a new deck of cards
+        :player_name -> For a friendlier interface.
+        :policy -> Makes the player's decisions. Defaults to asking at the
+            console, any other policy runs the game headless.
+        :start_amount -> Money to start with, randomized if not given.
+        :echo -> Function used for all output. Defaults to print for
+            console play and to no output at all for a headless game.
+        :shoe -> The shoe to deal from, defaults to one of the rules' decks.
+        :rng -> Random generator for the start amount and the default
+            shoe, defaults to the random module.
+        :renderer -> Draws the game in place on a terminal, by default
+            console play uses one when stdout is a terminal.
+        :record -> Called with the RoundResult of every settled round,
+            e.g. the write method of a blackJackLog.HandLog.
+        :hints -> Solved strategy table, as from
+            blackJackStrategy.load_strategy. If given, the expected value
+            of each legal move is shown before every decision.
+        :rules -> The table rules."""
+        if start_amount is None:
+            start_amount = roundup((rng or random).randint(1_000, 10_000) )          #randomized amount in $ to start the game
+        self.start_amount = start_amount
+        if renderer is None and policy is None and echo is None and sys.stdout.isatty():
+            renderer = TerminalRenderer()
+        self.renderer = renderer
+        if echo is None:
+            echo = renderer.echo if renderer is not None \
+                else print if policy is None else _silent
+        if policy is None:
+            policy = ConsolePolicy() if renderer is None \
+                else ConsolePolicy(renderer.echo, renderer.ask)
+        self.policy = policy
+        self.echo = echo
+        self.verbose = echo is not _silent                         #False when nothing needs to be rendered
+        self.shoe = shoe if shoe is not None else Shoe(rules.decks, rng=rng)    #shoe of card codes to deal from
+        self.record = record
+        self.hints = hints
+        self.dealt_from = self.shoe.pos                            #shoe position the round was dealt from
+        self.moves = ''                                            #moves picked this round
         self.player_name = player_name                             
-        #Player object that stores player details
-        self.player = Player([self.deck.pop(), self.deck.pop()], 0, self.player_name)   
-        #Dealer object that stores dealer details
-        self.dealer = Dealer([self.deck.pop(), self.deck.pop()])          
-
-        # If player does decide to split his hand, stores second hand
-        # Need to look for a better way to achieve this
-        self.player_split = Player([], 0, player_name + " hand_two")
+        self.compile_rules(rules)
+        # A slot for every hand the player could split into. The
+        # slots are reused every round, only the first n_hands are
+        # in play.
+        self.hands = [Player([], 0, player_name + suffix) for suffix in HAND_NAMES]
+        self.player = self.hands[0]                 #Player object that stores player details
+        self.player_split = self.hands[1]           #second hand, if player does decide to split
+        self.dealer = Dealer([])                    #Dealer object that stores dealer details
+        self.n_hands = 1
         self.split = False                                               #Flag to determine if a player does split.
 
+    def compile_rules(self, rules: Rules) -> None:
+        """Turns the rules into the lookup tables a round is played by,
+        so the rules themselves are never looked at during a round.
+
+        :rules -> The table rules."""
+        self.rules = rules
+        self.max_hands = rules.max_hands
+        self.dealer_hits = rules.dealer_hits()                  #[soft][value], True if the dealer hits
+        # [split][soft][value], True if a two card hand may double
+        self.doubles = (rules.doubles(), rules.doubles() if rules.double_after_split else NO_DOUBLES)
+        self.surrenders = (rules.surrender, False)              #[split], True if surrender is allowed
+        # hard total of a natural, 0 if naturals aren't paid since no
+        # two cards are worth 0
+        self.natural_hard = 11 if rules.blackjack_pays is not None else 0
+        self.natural_pays = rules.blackjack_pays or (1, 1)      #(win, bet) of a natural
+
     def player_or_split(self, entity: Entity) -> bool:
         """Checks if entity is original hand or a split
         hand.
@@ -201,6 +894,19 @@ class BlackJack:
         :entity -> The player or second hand."""
         return entity == self.player        
 
+    def is_natural(self, entity: Entity) -> bool:
+        """Returns True if the entity's hand is a natural, two cards
+        worth 21 that weren't split, and the rules pay naturals. A
+        natural is settled without the player picking a move."""
+        return bool(entity.aces) and entity.hard == self.natural_hard \
+            and len(entity.hand) == 2 and not self.split
+
+    def in_play(self, entity: Entity) -> bool:
+        """Checks if entity is one of the player's hands this round.
+
+        :entity -> A hand slot of the player."""
+        return self.hands.index(entity) < self.n_hands
+
     def entity_hit(self, entity: Entity) -> None:
         """A function that picks a card ((H)its) for the desired
         entity.
@@ -208,218 +914,278 @@ class BlackJack:
         entity -> Player/second_hand/dealer."""
 
         # entity = self.player if self.player_or_split(entity) else self.player_split
-        card = self.deck.pop()                  #remove card from top of deck
-        print(f"{entity.name} chooses a card\n")
-        print(f"{entity.name} draws {card.rank} of {card.suit}\n")
-        entity.hand.append(card)                #adds card to entity's hand
+        card = self.shoe.deal()                 #remove card from top of deck
+        if self.verbose:
+            self.echo(f"{entity.name} chooses a card\n")
+            self.echo(f"{entity.name} draws {RANKS[card % 13]} of {SUITS[card // 13]}\n")
+        entity.add_card(card)                   #adds card to entity's hand
 
         #prints the dealer/player total value of hand
         # and shows the dealer/player's cards.
         self.display_scores()
-        # self.print_total(self.dealer)
-        # print(self.dealer.show_all_cards(True))
-        # self.print_total(entity)
-        # print(entity.show_all_cards())
 
 
 
     def entity_bet(self, entity: Entity, amt: int) -> Optional[int]:
-        """A function that asks the user to input an amount
-        to bet and returns it or quits the game entirely.
+        """A function that asks the policy for an amount
+        to bet and returns it.
         
         :entity -> Player/split_hand.
         :amt: -> The maximum amount allowed to bet."""
 
+        return self.decide(self.bet_steps(entity, amt))
+
+    def bet_steps(self, entity: Entity, amt: int) -> Generator:
+        """The steps of entity_bet, yielding the policy's bet decision.
+
+        :entity -> Player/split_hand.
+        :amt: -> The maximum amount allowed to bet."""
+
         # entity = self.player if self.player_or_split(entity) else self.player_split
         if not isinstance(entity, Player):      #checks if entity is dealer to avoid errors
             return
-        while True:                             #loop until player enters a valid amount.
-            try:
-                print(f"Enter an amount from $1 - ${amt} or press (Q)uit.")
-                money_to_bet = input('> ').strip().upper()
-                if money_to_bet == 'Q':
-                    print("Thanks for playing.")
-                    print("..or maybe you can't actually play :)")
-                    sys.exit()                  #exits game.
-
-                money_to_bet = int(money_to_bet)
-                if 1 <= money_to_bet <= amt:            
-                    entity.money = money_to_bet         #money within reasonable range
-                    return money_to_bet
-                print("Amount not within range.\n")
-            except ValueError:
-                print("Enter a valid amount.\n")        #Ask again, invalid input
+        money_to_bet = yield 'bet', entity, amt
+        if not 1 <= money_to_bet <= amt:
+            raise ValueError(f"Bet of ${money_to_bet} is not within $1 - ${amt}.")
+        entity.money = money_to_bet             #money within reasonable range
+        return money_to_bet
 
     def entity_stand(self, entity: Entity) -> None:
         """For consistency print's player 'stands down' to console."""
-        print(f"{entity.name} chooses to stand down...")
+        self.echo(f"{entity.name} chooses to stand down...")
 
     def entity_double_down(self, entity) -> None:
         """Called when a player chooses to (D)ouble down."""
 
         # entity = self.player if self.player_or_split(entity) else self.player_split
-        print(f"\n{entity.name} chooses to double down...")
+        self.echo(f"\n{entity.name} chooses to double down...")
         new_bet = entity.money * 2                              
-        print(f"{entity.name}'s bet has been increased by ${entity.money} to ${new_bet}.\n")
+        self.echo(f"{entity.name}'s bet has been increased by ${entity.money} to ${new_bet}.\n")
         entity.money = new_bet              #double the player's bet
         self.entity_hit(entity)             #player has to hit once after doubling down
-        if entity.get_hand_value() > 21:
+        if entity.get_hand_value() > entity.limit:
             return
         self.entity_stand(entity)           #player stands down
 
-    def entity_split(self) -> None:
-        """Called when a player decides to (X)split"""
+    def entity_surrender(self, entity: Player) -> None:
+        """Called when a player chooses to (R)surrender."""
+        self.echo(f"{entity.name} surrenders, half the bet is returned.")
+        entity.surrendered = True
 
+    def entity_split(self, entity: Optional[Entity] = None) -> None:
+        """Called when a player decides to (X)split
+
+        :entity -> The hand to split, the player's main hand by default."""
+
+        entity = entity if entity is not None else self.player
         self.split = True                   #sets flag to show player decided to split.
-        print(f"{self.player.name} decided to split...")
-        card = self.player.hand.pop()               
-        # removes one card from the player and adds it
-        # to the split hand, also adds a new card to
-        # both hands and adds the initial bet to the
-        # second hand.
+        self.echo(f"{entity.name} decided to split...")
+        new_hand = self.hands[self.n_hands]     #next free hand slot
+        self.n_hands += 1
+        card = entity.pop_card()
+        # removes one card from the hand and adds it
+        # to the new hand, also adds a new card to
+        # both hands and adds the hand's bet to the
+        # new hand.
         # Split is only possible if the player can actually
-        # double down.
-        self.player_split.hand.extend([card, self.deck.pop()]) 
-        self.player_split.money = self.player.money
-        print(f"\n{self.player_split.name} has bet with ${self.player.money}")
-        self.player.hand.append(self.deck.pop())
-        print()
+        # afford another bet.
+        new_hand.add_card(card)
+        new_hand.add_card(self.shoe.deal())
+        new_hand.money = entity.money
+        self.echo(f"\n{new_hand.name} has bet with ${entity.money}")
+        entity.add_card(self.shoe.deal())
+        self.echo()
+
+    def legal_moves(self, entity: Entity) -> str:
+        """Returns the moves available to the entity as a string of
+        letters: (H)it, (S)tand, (D)ouble down, (X)split and (R)surrender."""
+
+        # Hit and stand are always available, the other moves
+        # only on the hand's first turn.
+        if len(entity.hand) != 2 or not isinstance(entity, Player):
+            return 'HS'
+
+        # checks if player has enough money left for another
+        # bet. The rules decide which totals can be doubled,
+        # before and after a split, and cards of the same
+        # rank can be split until the player has max_hands
+        # hands.
+        staked = 0
+        for hand in self.hands[:self.n_hands]:
+            staked += hand.money
+        afford = self.start_amount - staked >= entity.money
+        double = afford and self.doubles[self.split][entity.soft][entity.get_hand_value()]
+        split = afford and entity.pair and self.n_hands < self.max_hands
+        return LEGAL_MOVES[double + 2 * split + 4 * self.surrenders[self.split]]
 
     def entity_possible_moves(self, entity: Entity) -> str:
         """A function that returns the players choice.
         The player can choose to (H)it, (S)tand, (X)split or (D)ouble down if available."""
 
-        moves = ['(H)it', '(S)tand']        #moves always available
+        return self.decide(self.move_steps(entity))
 
-        # checks if player has enough money to bet
-        # and if this is the player's first turn.
-        # Also checks if cards have the same rank to
-        # determine if player can split.
-        # player can only split once.
-        if len(entity.hand) == 2 and (self.start_amount - entity.money) \
-            >= entity.money and (entity is self.player) and not self.split:
-            moves.append('(D)ouble down')                       #player can double down
-            if str(entity.hand[0].rank) == str(entity.hand[1].rank):    
-                moves.append('(X)split')                        #player can split
+    def move_steps(self, entity: Entity) -> Generator:
+        """The steps of entity_possible_moves, yielding the policy's move
+        decision."""
+
+        moves = self.legal_moves(entity)
+        if self.hints is not None:
+            self.echo(self.hint_line(entity, moves))
+        move = yield 'move', entity, self.dealer.hand[1], moves
+        if len(move) != 1 or move not in moves:
+            raise ValueError(f"Move {move!r} is not one of the legal moves {moves!r}.")
+        return move
+
+    def move_hints(self, entity: Entity, moves: Optional[str] = None) -> Dict[str, float]:
+        """Returns the expected value of each legal move for the entity,
+        looked up in the hints table.
+
+        :entity -> Player or player's second hand.
+        :moves -> The legal moves, worked out if not given."""
+        if moves is None:
+            moves = self.legal_moves(entity)
+        return move_hints(self.hints, entity, self.dealer.hand[1], moves, self.is_natural(entity))
+
+    def hint_line(self, entity: Entity, moves: str) -> str:
+        """Returns the hints for the entity's legal moves as a line of text."""
+        hints = self.move_hints(entity, moves)
+        return "Expected value per $1 bet: " + ', '.join(
+            f"{MOVE_NAMES[move]} {ev:+.3f}" for move, ev in hints.items())
+
+    def total_line(self, entity: Entity, show_dealer_tot: bool = False) -> str:
+        """Returns the line showing the dealer/player's total.
 
-        prompt = ', '.join(moves) + '> '
-        while True:             #ask player until player returns a valid move.
-            player_choice = input(prompt).strip().upper()
-            if player_choice in ('H', 'S'):
-                return player_choice
-            if player_choice == 'D' and '(D)ouble down' in moves:
-                return player_choice        #ensures (D)ouble down is possible
-            if player_choice == 'X' and '(X)split' in moves:
-                return player_choice        #ensures (X)split is possible
-            print("Enter a valid choice.")   
-
-    def print_total(self, entity: Entity, show_dealer_tot: bool = False) -> None:
-        """A utility function that prints the dealer/player's total.
-        
         :entity -> Player/Dealer/Player_spit.
         :show_dealer_tot -> Whether to show the dealer's total score or not.
         """
 
         if entity.name.lower() == "dealer":
             if not show_dealer_tot:
-                print("Dealer hand total: ???")
-            else:
-                print("Dealer hand total: ", self.dealer.get_hand_value())
-        else:
-            print(f"{entity.name} hand total: ", entity.get_hand_value())
+                return "Dealer hand total: ???"
+            return f"Dealer hand total:  {self.dealer.get_hand_value()}"
+        return f"{entity.name} hand total:  {entity.get_hand_value()}"
 
     def display_scores(self, flag_dealer: bool = False, show_dealer: bool = True,
         show_player_main: bool = True, show_player_split: bool = True) -> None:
         """A utility function to display player score and display
-        the cards in each hand.
+        the cards in each hand. With a renderer the hands are redrawn
+        in place, otherwise they are printed below the last output.
         
         :flag_dealer -> Determines if dealer shows all cards
             if True show scores and all cards face up.
         :show_one -> Display only player's main hand or second hand."""
 
-        # print dealer's total and print hand
+        if not self.verbose:                    #headless, nothing to draw
+            return
+
+        lines = []
+        # dealer's total and hand
         if show_dealer:
-            self.print_total(self.dealer, flag_dealer)
-            print(self.dealer.show_all_cards(not flag_dealer))
+            lines.append(self.total_line(self.dealer, flag_dealer))
+            lines.append(self.dealer.show_all_cards(not flag_dealer))
 
-        # print player's total and print hand
+        # player's total and hand
         if show_player_main:
-            self.print_total(self.player)
-            print(self.player.show_all_cards())
+            lines.append(self.total_line(self.player))
+            lines.append(self.player.show_all_cards())
 
-        # print player's split hand total and print hand
-        # if it exists
+        # player's split hands totals and hands
+        # if they exist
         if show_player_split:
-            self.print_total(self.player_split) if self.split == True else None
-            print(self.player_split.show_all_cards()) if self.split == True else None
+            for hand in self.hands[1:self.n_hands]:
+                lines.append(self.total_line(hand))
+                lines.append(hand.show_all_cards())
+
+        if self.renderer is not None:
+            self.renderer.show_table('\n'.join(lines).split('\n'))
+            return
+        for line in lines:
+            self.echo(line)
 
     def dealer_play(self) -> None:
         """Simulates the Dealer's play."""
-        while self.dealer.get_hand_value() < 17:    #break if dealer goes above 17
-            print("Dealer hits...")
-            self.dealer.hand.append(self.deck.pop())    #dealer picks card
+        hits = self.dealer_hits
+        while hits[self.dealer.soft][self.dealer.get_hand_value()]:    #break once the rules say stand
+            self.echo("Dealer hits...")
+            self.dealer.add_card(self.shoe.deal())       #dealer picks card
 
             # Display player scores
             self.display_scores()
 
             # If dealer goes above 21, dealer busts.
-            if self.dealer.get_hand_value() > self.dealer.limit + 4:
+            if self.dealer.get_hand_value() > BLACKJACK:
                 return
-            input("Press Enter to continue...")
-            print('\n')
+            self.policy.pause()
+            self.echo('\n')
 
     def entity_play(self, entity: Entity) -> None:
         """Simulates an entity's play.
         
-        :entity -> Player or player's second hand."""
-        # entity = self.player if self.player_or_split(entity) else self.player_split
+        :entity -> Player or one of the player's split hands."""
+        return self.decide(self.play_steps(entity))
+
+    def play_steps(self, entity: Entity) -> Generator:
+        """The steps of entity_play, yielding each of the policy's move
+        decisions.
+
+        :entity -> Player or one of the player's split hands."""
         # check if player chose to (X)split
-        # if not and entity is player_split
-        # we return
-        if not self.player_or_split(entity):
-            if not self.split:
-                return
+        # if not and entity is a split hand
+        # we return, a natural stands without a move
+        if not self.in_play(entity) or self.is_natural(entity):
+            return
 
-        while True:                                         #loop until player busts or (S)tand
-            if entity.get_hand_value() > entity.limit:      #player has burst
-                return
-            print(f"\n----{entity.name} pick a move---\n")
-            move = self.entity_possible_moves(self.player)  #get all possible moves
-            if move.upper() == "S":                        #player chooses to stand, exit func
-                self.entity_stand(entity)
-                return
-            if move.upper() == 'D':                         #player chooses to (D)ouble down
-                self.entity_double_down(entity)             #double down then (ST)tand
-                return
-            if move.upper() == 'H':                         #player chooses to (H)it
-                self.entity_hit(entity)
-            if move.upper() == 'X':                         #playeer chooses to (X)split
-                self.entity_split()
-                self.display_scores()
-                if entity is self.player and \
-                    self.player.get_hand_value() < self.player.limit:
-                    continue
+        while entity.get_hand_value() <= entity.limit:      #loop until player busts or (S)tand
+            self.echo(f"\n----{entity.name} pick a move---\n")
+            move = yield from self.move_steps(entity)       #get all possible moves
+            if not self.entity_move(entity, move):
                 return
 
+    def entity_move(self, entity: Entity, move: str) -> bool:
+        """Carries out a move and returns True if the entity gets to
+        pick another one.
+
+        :entity -> Player or player's second hand.
+        :move -> One of the letters returned by legal_moves."""
+        self.moves += move
+        if move == "S":                                 #player chooses to stand, exit func
+            self.entity_stand(entity)
+            return False
+        if move == 'D':                                 #player chooses to (D)ouble down
+            self.entity_double_down(entity)             #double down then (ST)tand
+            return False
+        if move == 'H':                                 #player chooses to (H)it
+            self.entity_hit(entity)
+            return True
+        if move == 'X':                                 #playeer chooses to (X)split
+            self.entity_split(entity)
+            self.display_scores()
+            return entity.get_hand_value() < entity.limit
+        if move == 'R':                                 #player chooses to (R)surrender
+            self.entity_surrender(entity)
+            return False
+        raise ValueError(f"Unknown move {move!r}.")
+
     def check_if_dealer_plays(self) -> None:
         """Utility fuction to check if player has already
         bust. If player has burst, dealer does not need to play."""
 
-        if self.player.get_hand_value() <= self.player.limit:              #player did not burst
+        if self.player.is_live():                                   #player did not burst
             self.dealer_play()                                      
             return 
         # if player (S)plit, hand is less than limit
         # check dealer's hand. Useful because the 
         # player's main hand can go above limit but
-        # player's second hand doesn't
-        if self.split:                                                     #check if player_split exists                                   
-            if self.player_split.get_hand_value() <= self.player_split.limit:
+        # player's other hands don't
+        for hand in self.hands[1:self.n_hands]:
+            if hand.is_live():
                 self.dealer_play()
                 return
         return
 
-    def check_who_wins(self, entity: Entity) -> None:
-        """A function used to determine which hand/entity won."""
+    def check_who_wins(self, entity: Entity) -> int:
+        """A function used to determine which hand/entity won.
+        Returns the money the hand won (positive) or lost (negative)."""
 
         # Check if player's second hand exists,
         # because we call the function with both the 
@@ -427,9 +1193,8 @@ class BlackJack:
         # to exit early if the player does not actually split.
         flag = self.player_or_split(entity)         #check if player or entiity
 
-        if not self.player_or_split(entity):
-            if not self.split:
-                return                              #player did not split, exit
+        if not self.in_play(entity):
+            return 0                                #player did not split, exit
 
         # player and dealer's hand total
         entity_value = entity.get_hand_value()
@@ -439,81 +1204,246 @@ class BlackJack:
         self.display_scores(True, show_player_main=flag, show_player_split=not flag)
 
         if entity_value > entity.limit:
-            print(f"\n{entity.name} goes bust")
-            print(f"{entity.name} lost ${entity.money}!")
+            self.echo(f"\n{entity.name} goes bust")
+            self.echo(f"{entity.name} lost ${entity.money}!")
             self.start_amount -= entity.money                  
-            return
-        if dealer_value > 21:
-            print(f"Dealer goes bust! {entity.name} wins ${entity.money}")
+            return -entity.money
+        if entity.surrendered:
+            lost = entity.money - entity.money // 2            #half the bet back, rounded down
+            self.echo(f"{entity.name} surrendered and lost ${lost}.")
+            self.start_amount -= lost
+            return -lost
+
+        # naturals, only ever true when the rules pay them
+        natural = self.is_natural(entity)
+        dealer_natural = self.dealer.aces and self.dealer.hard == self.natural_hard \
+            and len(self.dealer.hand) == 2
+        if natural and not dealer_natural:
+            won = entity.money * self.natural_pays[0] // self.natural_pays[1]
+            self.echo(f"Blackjack! {entity.name} wins ${won}")
+            self.start_amount += won
+            return won
+        if dealer_natural and not natural:
+            self.echo(f"Dealer has blackjack, {entity.name} lost ${entity.money}!")
+            self.start_amount -= entity.money
+            return -entity.money
+
+        if dealer_value > BLACKJACK:
+            self.echo(f"Dealer goes bust! {entity.name} wins ${entity.money}")
             self.start_amount += entity.money                  #add to player's total money
+            return entity.money
         elif entity_value < dealer_value:
-            print(f"\nDealer's hand is {dealer_value}, {entity.name}'s hand is {entity_value}\n")
-            print(f"{entity.name} lost ${entity.money}!")
+            self.echo(f"\nDealer's hand is {dealer_value}, {entity.name}'s hand is {entity_value}\n")
+            self.echo(f"{entity.name} lost ${entity.money}!")
             self.start_amount -= entity.money                  #subtract from player's total money
+            return -entity.money
         elif entity_value > dealer_value:
-            print(f"{entity.name} won ${entity.money}")
+            self.echo(f"{entity.name} won ${entity.money}")
             self.start_amount += entity.money                  #add to player's total money
-        elif entity_value == dealer_value:
-            print("It's a tie, the bet is returned to you.")
-
+            return entity.money
+        self.echo("It's a tie, the bet is returned to you.")
+        return 0
+
+
+    def snapshot(self) -> bytes:
+        """Returns the state of the game packed into bytes: the money,
+        every hand and the undealt cards in order. A game between rounds
+        of a single deck shoe fits in under 100 bytes, each extra deck
+        adds at most 52. The policy, output, random generator and rules
+        are not included."""
+
+        name = self.player_name.encode()[:255]
+        shoe = self.shoe
+        hands = self.hands[:self.n_hands]
+        header = SNAPSHOT.pack(SNAPSHOT_VERSION, self.start_amount,
+            self.n_hands, shoe.decks, shoe.cut - shoe.pos, len(shoe),
+            shoe.penetration, len(self.dealer.hand), len(name))
+        return b''.join((header,
+            *(SNAPSHOT_HAND.pack(hand.money, len(hand.hand) | SURRENDERED * hand.surrendered)
+                for hand in hands),
+            name, *(bytes(hand.hand) for hand in hands), bytes(self.dealer.hand),
+            shoe.cards[shoe.pos:].tobytes()))
+
+    def restore(self, blob: bytes) -> None:
+        """Puts the game back in the state a snapshot was taken in.
+
+        :blob -> Bytes returned by snapshot."""
+
+        (version, start_amount, n_hands, decks, to_cut, left, penetration,
+            n_dealer, n_name) = SNAPSHOT.unpack_from(blob)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Can't restore a version {version} snapshot.")
+        if not 1 <= n_hands <= MAX_HANDS:
+            raise ValueError("Snapshot is truncated or corrupt.")
+        pos = SNAPSHOT.size + SNAPSHOT_HAND.size * n_hands
+        hands = [SNAPSHOT_HAND.unpack_from(blob, SNAPSHOT.size + SNAPSHOT_HAND.size * i)
+            for i in range(n_hands)]
+        if len(blob) != pos + n_name + sum(n & ~SURRENDERED for _, n in hands) + n_dealer + left:
+            raise ValueError("Snapshot is truncated or corrupt.")
+
+        self.start_amount = start_amount
+        self.player_name = blob[pos:pos + n_name].decode()
+        pos += n_name
+        for hand, suffix in zip(self.hands, HAND_NAMES):
+            hand.name = self.player_name + suffix
+            hand.reset()
+        for hand, (money, n_cards) in zip(self.hands, hands):
+            hand.reset(tuple(blob[pos:pos + (n_cards & ~SURRENDERED)]))
+            hand.money = money
+            hand.surrendered = bool(n_cards & SURRENDERED)
+            pos += n_cards & ~SURRENDERED
+        self.n_hands = n_hands
+        self.split = n_hands > 1
+        self.dealer.reset(tuple(blob[pos:pos + n_dealer]))
+        pos += n_dealer
+
+        # only the undealt cards were kept, they become the whole
+        # shoe until it is next shuffled.
+        shoe = self.shoe
+        shoe.decks = decks
+        shoe.penetration = penetration
+        shoe.cards = array('B', blob[pos:])
+        shoe.pos = 0
+        shoe.cut = to_cut
+        self.dealt_from = 0
+        self.moves = ''
 
     def reset(self) -> None:
-        """Utitlity function that resets the deck of cards and bet
-        if player decides to play again."""
-
-        self.deck = make_cards()
-        self.player = Player([self.deck.pop(), self.deck.pop()], 0, self.player_name)
-        self.dealer = Dealer([self.deck.pop(), self.deck.pop()])
-        self.player_split = Player([], 0, self.player_name + " hand_two")
+        """Utitlity function that deals new hands and resets the bet
+        if player decides to play again. The shoe is reshuffled
+        once the cut card has come out."""
+
+        if self.shoe.cut_reached():
+            self.shuffle()
+        self.deal()
+
+    def shuffle(self) -> None:
+        """Gathers the cards back into the shoe and shuffles it."""
+        self.shoe.shuffle()
+
+    def deal(self) -> None:
+        """Deals fresh hands from the shoe, reusing the hand slots of
+        the last round."""
+        shoe = self.shoe
+        self.clear()
+        self.player.reset((shoe.deal(), shoe.deal()))
+        self.dealer.reset((shoe.deal(), shoe.deal()))
+
+    def clear(self) -> None:
+        """Discards the split hands and moves of the last round, ready
+        for the next round to be dealt from the shoe's position."""
+        self.dealt_from = self.shoe.pos
+        self.moves = ''
+        for hand in self.hands[1:self.n_hands]:
+            hand.reset()
+        self.n_hands = 1
         self.split = False
 
+    def play_round(self) -> RoundResult:
+        """Plays a single round, from the bet to settlement, and
+        returns a record of it. Fresh hands are dealt first so the
+        hands left over from the last round are discarded."""
+        return self.decide(self.round_steps())
 
-    def game(self) -> None:
-        """Main function that controls the game."""
-        print(RULES)                    
-        print(f"You have been credited with ${self.start_amount}")
+    def round_steps(self) -> Generator:
+        """The steps of play_round, yielding the policy's bet and move
+        decisions."""
 
-        # main game loop, loop infinitely until
-        # player decides to quit or player looses
-        # all his/her money
-        while True:         
-            if self.start_amount < 1:
-                print("You've run out of money")
-                print("Good thing you weren't using real money.")
-                print("Try to seek professional help for your gambling problems.")
-                sys.exit()          #player is broke, exit game 
+        self.reset()
 
-            print(f"Money available: ${self.start_amount}")   
+        # Get the amount player wants to stake.
+        amt_to_bet = yield from self.bet_steps(self.player, self.start_amount)
+        self.echo(f"Player bet ${amt_to_bet}")
 
-            # Get the amount player wants to stake.
-            amt_to_bet = self.entity_bet(self.player, self.start_amount)
-            print(f"Player bet ${amt_to_bet}")
+        # Display player scores
+        self.display_scores()
 
-            # Display player scores
-            self.display_scores()
+        # play each of the player's hands, hands split
+        # off get their turn after the ones before them
+        hand = 0
+        while hand < self.n_hands:
+            yield from self.play_steps(self.hands[hand])
+            hand += 1
 
-            # play for both player and player's second
-            # hand if he does split
-            self.entity_play(self.player)
-            self.entity_play(self.player_split)
+        result = self.round_result(amt_to_bet, self.settle_round())
+        if self.record is not None:
+            self.record(result)
+        return result
+
+    def settle_round(self) -> Tuple[int, ...]:
+        """Plays the dealer's hand if needed and settles every hand.
+        Returns what each hand won or lost."""
+
+        # after player busts or (St)ands
+        # check if dealer needs to play
+        self.check_if_dealer_plays()
+
+        # check which hand - player main or split
+        # hands if existent- won.
+        return tuple([self.check_who_wins(hand) for hand in self.hands[:self.n_hands]])
+
+    def round_result(self, bet: int, payouts: Tuple[int, ...],
+        cards: Optional[bytes] = None) -> RoundResult:
+        """Returns the record of the round just settled.
+
+        :bet -> The amount staked on the main hand.
+        :payouts -> What each hand won or lost, from settle_round.
+        :cards -> Cards of the round in dealing order, by default the
+            cards dealt from the shoe since the round was dealt."""
+        shoe = self.shoe
+        hands = self.hands[:self.n_hands]
+        if cards is None:
+            cards = shoe.cards[self.dealt_from:shoe.pos].tobytes()
+        return RoundResult(bet, sum(payouts),
+            tuple([hand.get_hand_value() for hand in hands]),
+            self.dealer.get_hand_value(),
+            tuple([hand.money for hand in hands]), payouts, cards, self.moves,
+            len(self.dealer.hand))
+
+    def decide(self, steps: Generator):
+        """Runs the steps of a round, or part of one, answering each
+        decision they yield with the policy, and returns what they
+        return. The server's AsyncBlackJack overrides this alone to
+        await its players' answers.
+
+        :steps -> Generator of one of the *_steps methods, it yields the
+            name of the Policy method to ask and its arguments."""
+        try:
+            request = next(steps)
+            while True:
+                ask, *args = request
+                request = steps.send(getattr(self.policy, ask)(*args))
+        except StopIteration as done:
+            return done.value
 
-            # after player busts or (St)ands
-            # check if dealer needs to play
-            self.check_if_dealer_plays()
+    def game(self) -> None:
+        """Main function that controls the game."""
+        return self.decide(self.game_steps())
 
-            # check which hand - player main or second hand
-            # if existent- won.
-            self.check_who_wins(self.player)
-            self.check_who_wins(self.player_split)
+    def game_steps(self) -> Generator:
+        """The steps of game, yielding the policy's decisions until the
+        player quits or runs out of money."""
+        self.echo(rules_text(self.rules))
+        self.echo(f"You have been credited with ${self.start_amount}")
+
+        # main game loop, loop until player decides
+        # to quit or player looses all his/her money
+        while self.start_amount >= 1:
+            self.echo(f"Money available: ${self.start_amount}")
+
+            yield from self.round_steps()
 
             # start all over again
-            input("Press Enter to continue...")
-            print('\n')
+            self.policy.pause()
+            self.echo('\n')
 
-            # reset stats.
-            self.reset()
             # clear console
-            os.system('cls') if sys.platform == "win32" else os.system('clear')
+            if self.renderer is not None:
+                self.renderer.clear()
+
+        self.echo("You've run out of money")
+        self.echo("Good thing you weren't using real money.")
+        self.echo("Try to seek professional help for your gambling problems.")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Title: Blackjack benchmarks
+Description: Times the hot paths of blackJack.py, from making a deck up
+to a full headless round. Results can be written as JSON and checked
+against a stored baseline, so a slowdown shows up before it ships.
+Tag: Game
+"""
+
+import argparse, json, platform, random, statistics, sys, timeit
+from typing import Callable, Dict, List, Optional, Tuple
+
+from blackJack import BlackJack, Player, Shoe, StrategyPolicy, make_cards
+from blackJackTable import MAX_SEATS, Table
+
+BANKROLL = 10 ** 12         #start amount large enough that no bet is ever refused
+
+
+def _make_cards() -> Callable[[], object]:
+    rng = random.Random(0)
+    return lambda: make_cards(rng)
+
+
+def _get_hand_value() -> Callable[[], object]:
+    return Player([12, 25, 5], 10, "bench").get_hand_value     #two aces and a seven
+
+
+def _show_all_cards() -> Callable[[], object]:
+    return Player([12, 21, 30, 44], 10, "bench").show_all_cards
+
+
+def _game() -> BlackJack:
+    """A headless game playing basic strategy from a seeded shoe."""
+    rng = random.Random(0)
+    return BlackJack("bench", StrategyPolicy(), start_amount=BANKROLL,
+        shoe=Shoe(rng=rng), rng=rng)
+
+
+def _reset() -> Callable[[], object]:
+    return _game().reset
+
+
+def _round() -> Callable[[], object]:
+    return _game().play_round
+
+
+def _table_round() -> Callable[[], object]:
+    rng = random.Random(0)
+    return Table([StrategyPolicy() for _ in range(MAX_SEATS)], start_amount=BANKROLL,
+        shoe=Shoe(rng=rng), rng=rng).play_round
+
+
+# name -> setup returning the operation to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {
+    'make_cards': _make_cards,
+    'get_hand_value': _get_hand_value,
+    'show_all_cards': _show_all_cards,
+    'reset': _reset,
+    'round': _round,
+    'table_round': _table_round,
+}
+
+
+def bench(op: Callable[[], object], repeat: int = 5, min_time: float = 0.2) -> dict:
+    """Times an operation and returns its throughput and latency. The
+    number of calls per repetition is picked so that one repetition
+    takes at least min_time, and a first repetition is thrown away to
+    warm up.
+
+    :op -> The operation, called without arguments.
+    :repeat -> Number of timed repetitions.
+    :min_time -> Seconds each repetition should last."""
+    timer = timeit.Timer(op)
+    number = 1
+    while timer.timeit(number) < min_time:     #also serves as the warmup
+        number *= 2
+    latencies = [timer.timeit(number) / number * 1e9 for _ in range(repeat)]
+    median = statistics.median(latencies)
+    return {'ops_per_sec': 1e9 / median, 'latency_ns': {'min': min(latencies),
+        'median': median, 'max': max(latencies)}, 'number': number, 'repeat': repeat}
+
+
+def run(names: Optional[List[str]] = None, repeat: int = 5, min_time: float = 0.2,
+    echo: Callable[..., None] = print) -> dict:
+    """Runs benchmarks and returns the results, ready to be dumped as JSON.
+
+    :names -> Benchmarks to run, all of BENCHMARKS by default.
+    :repeat -> Number of timed repetitions of each.
+    :min_time -> Seconds each repetition should last.
+    :echo -> Reports each result as it comes in."""
+    results = {}
+    for name in names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark {name!r}, pick from {', '.join(BENCHMARKS)}.")
+        results[name] = res = bench(BENCHMARKS[name](), repeat, min_time)
+        echo(f"{name:<16}{res['ops_per_sec']:>14,.0f} ops/s{res['latency_ns']['median']:>12,.0f} ns/op")
+    return {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+        'machine': platform.machine(), 'benchmarks': results}
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.1) -> List[Tuple[str, float]]:
+    """Returns the benchmarks whose median latency grew by more than
+    tolerance over the baseline, with the fraction they grew by.
+    Benchmarks missing from either side are skipped.
+
+    :results -> Results returned by run.
+    :baseline -> Results of an earlier run.
+    :tolerance -> Slowdown allowed, 0.1 is 10%."""
+    regressions = []
+    for name, res in results['benchmarks'].items():
+        if name not in baseline['benchmarks']:
+            continue
+        before = baseline['benchmarks'][name]['latency_ns']['median']
+        change = res['latency_ns']['median'] / before - 1
+        if change > tolerance:
+            regressions.append((name, change))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the blackjack hot paths.")
+    parser.add_argument('names', nargs='*', metavar='name', help=f"any of {', '.join(BENCHMARKS)}")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2)
+    parser.add_argument('--json', help="file to write the results to")
+    parser.add_argument('--baseline', help="results to compare against, exits with 1 on a regression")
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = run(args.names, args.repeat, args.min_time)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, change in regressions:
+            print(f"Regression: {name} is {change:.1%} slower than the baseline")
+        sys.exit(1 if regressions else 0)
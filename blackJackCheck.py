@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Title: Blackjack self-check
+Description: Checks that the parts of blackJack.py built to agree with
+each other still do: the engine and the batch simulator settle the same
+cards the same way, a snapshot restores the game it was taken of, a
+logged game replays from its log and from its seed, every seat of a
+logged table replays like a game of its own, and the runner's totals
+don't depend on the number of workers. Each check returns the
+number of rounds that didn't agree, the command exits with 1 if any
+check found one.
+Tag: Game
+"""
+
+import argparse, os, random, sys, tempfile
+from array import array
+from typing import Callable, Dict
+
+from blackJack import BlackJack, Rules, Shoe, SimplePolicy, StrategyPolicy, parse_rules
+from blackJackLog import HandLog
+from blackJackReplay import Replayer, replay_log
+from blackJackStrategy import load_strategy
+from blackJackTable import MAX_SEATS, Table
+
+BANKROLL = 10 ** 12         #start amount large enough that no bet is ever refused
+UNIT = 10                   #bet that pays every natural and surrender in whole money
+
+
+def _game(rules: Rules, seed: int, record=None) -> BlackJack:
+    """A headless game playing the rules' strategy, started like
+    blackJackRunner starts one."""
+    rng = random.Random(seed)
+    return BlackJack("check", StrategyPolicy(UNIT, load_strategy(rules)), start_amount=BANKROLL,
+        shoe=Shoe(rules.decks, 0.75, rng), rng=rng, record=record, rules=rules)
+
+
+def check_sim(rounds: int, seed: int, rules: Rules) -> int:
+    """Plays the same cards through the batch simulator and the engine
+    and counts the rounds whose net, stakes or cards used differ."""
+    import numpy as np
+    from blackJackRng import numpy_generator
+    from blackJackSim import compile_rules, compile_strategy, deal_cards, money_won, play_rounds
+
+    table = load_strategy(rules)
+    cards = deal_cards(rounds, rules.decks, numpy_generator(seed))
+    net, wagered, used = play_rounds(cards, compile_strategy(table), compile_rules(rules))
+    net = money_won(net, np.full(rounds, UNIT))
+    game = _game(rules, seed)
+    shoe = game.shoe
+    bad = 0
+    for i in range(rounds):
+        shoe.cards = array('B', cards[i].tobytes())
+        shoe.pos = 0
+        shoe.cut = len(shoe.cards) + 1             #never reshuffle over the stacked cards
+        result = game.play_round()
+        if (result.net, sum(result.stakes), len(result.cards)) != (net[i], UNIT * wagered[i], used[i]):
+            bad += 1
+    return bad
+
+
+def check_snapshot(rounds: int, seed: int, rules: Rules) -> int:
+    """Restores a snapshot of a game into another before every round and
+    counts the rounds the two don't play alike, or whose snapshot didn't
+    round-trip. Rounds starting with a reshuffle are only restored, the
+    random generator isn't part of a snapshot."""
+    game = _game(rules, seed)
+    copy = _game(rules, seed + 1)
+    bad = 0
+    for _ in range(rounds):
+        blob = game.snapshot()
+        copy.restore(blob)
+        if copy.snapshot() != blob:
+            bad += 1
+            continue
+        if game.shoe.cut_reached():
+            game.play_round()
+            continue
+        if game.play_round() != copy.play_round() or game.snapshot() != copy.snapshot():
+            bad += 1
+    return bad
+
+
+def _log_path() -> str:
+    """Returns the path of a temporary log that doesn't exist yet."""
+    fd, path = tempfile.mkstemp(suffix='.log')
+    os.close(fd)
+    os.remove(path)
+    return path
+
+
+def check_replay(rounds: int, seed: int, rules: Rules) -> int:
+    """Logs a game and counts the rounds that don't replay, once dealt
+    from the logged cards and once from a shoe rebuilt from the seed."""
+    path = _log_path()
+    try:
+        with HandLog(path, rules=rules) as log:
+            game = _game(rules, seed, log.write)
+            for _ in range(rounds):
+                game.play_round()
+        logged, mismatches = replay_log(path)
+        seeded, seed_mismatches = replay_log(path, Replayer.from_seed(seed, rules))
+    finally:
+        os.remove(path)
+    return len(mismatches) + len(seed_mismatches) + (rounds - logged) + (rounds - seeded)
+
+
+def check_table(rounds: int, seed: int, rules: Rules) -> int:
+    """Logs a full table, where some seats keep hitting to 19 and bust
+    while the dealer plays out for the others, and counts the seat
+    rounds that don't replay as a game of their own."""
+    path = _log_path()
+    strategy = load_strategy(rules)
+    policies = [SimplePolicy(UNIT, 19) if n % 2 else StrategyPolicy(UNIT, strategy)
+        for n in range(MAX_SEATS)]
+    try:
+        with HandLog(path, rules=rules) as log:
+            rng = random.Random(seed)
+            table = Table(policies, BANKROLL, Shoe(rules.decks, 0.75, rng), rng, log.write,
+                rules=rules)
+            for _ in range(rounds):
+                table.play_round()
+        logged, mismatches = replay_log(path, Replayer(rules=rules))
+    finally:
+        os.remove(path)
+    return len(mismatches) + (rounds * MAX_SEATS - logged)
+
+
+def check_runner(rounds: int, seed: int, rules: Rules) -> int:
+    """Runs the same rounds on one worker and on two, with both engines,
+    and counts the engines whose totals differ."""
+    from blackJackRunner import ENGINES, run
+
+    block = max(rounds // 4, 1)
+    return sum(run(rounds, seed, 1, engine=engine, rules=rules, block=block)
+        != run(rounds, seed, 2, engine=engine, rules=rules, block=block) for engine in ENGINES)
+
+
+# name -> check, called with the rounds, seed and rules
+CHECKS: Dict[str, Callable[[int, int, Rules], int]] = {
+    'sim': check_sim,
+    'snapshot': check_snapshot,
+    'replay': check_replay,
+    'table': check_table,
+    'runner': check_runner,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check the engine, simulator, snapshots, logs, tables and runner agree.")
+    parser.add_argument('names', nargs='*', metavar='name', help=f"any of {', '.join(CHECKS)}")
+    parser.add_argument('--rounds', type=int, default=5_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rules', default='2d-h17-das-split3-es-bj3to2',
+        help="rule variant to check under, e.g. h17-das-es-bj3to2")
+    args = parser.parse_args()
+    rules = parse_rules(args.rules)
+    failed = 0
+    for name in args.names or CHECKS:
+        bad = CHECKS[name](args.rounds, args.seed, rules)
+        print(f"{name:<10}{'ok' if not bad else f'{bad} mismatched'}")
+        failed += bad
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Title: Blackjack card counting
+Description: A shoe for blackJack.py that keeps a card count as it
+deals, and a policy that spreads its bets by the true count, to see
+what counting gains at these table rules.
+Tag: Game
+"""
+
+import argparse, random, time
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+from blackJack import (BASIC_STRATEGY, BlackJack, FULL_DECK, Player, Shoe,
+    StrategyPolicy, VALUES)
+from blackJackTable import MAX_SEATS, Table
+
+# tag of each card value, ace first then two through ten
+COUNT_SYSTEMS: Dict[str, Tuple[int, ...]] = {
+    'hilo': (-1, 1, 1, 1, 1, 1, 0, 0, 0, -1),
+    'ko': (-1, 1, 1, 1, 1, 1, 1, 0, 0, -1),
+    'omega2': (0, 1, 1, 2, 2, 2, 1, 0, -1, -2),
+    'zen': (-1, 1, 1, 2, 2, 2, 1, 0, 0, -2),
+}
+ROUND_CARDS = 4                 #cards dealt before the bet is asked for
+SPREAD = ((1, 1), (2, 2), (3, 4), (4, 8), (5, 12))      #(true count, units) of the default bet spread
+
+
+class CountingShoe(Shoe):
+    """A shoe that keeps the running count of the cards it has dealt.
+    Unbalanced systems, like KO, start from the usual initial running
+    count so their pivot doesn't depend on the number of decks."""
+
+    __slots__ = ('tags', 'start', 'running')
+
+    def __init__(self, decks: int = 6, penetration: float = 0.75,
+        rng: Optional[random.Random] = None,
+        system: Union[str, Sequence[int]] = 'hilo') -> None:
+        """Initializes and shuffles the shoe.
+
+        :decks -> Number of decks in the shoe, 1 to 8.
+        :penetration -> Fraction of the shoe dealt before the cut card.
+        :rng -> Random generator used to shuffle.
+        :system -> Name of one of COUNT_SYSTEMS, or the tag of each card
+            value, ace first then two through ten."""
+        tags = COUNT_SYSTEMS[system] if isinstance(system, str) else tuple(system)
+        if len(tags) != 10:
+            raise ValueError(f"A count needs a tag for each of the 10 card values, not {len(tags)}.")
+        self.tags = tuple(tags[VALUES[card] - 1] for card in FULL_DECK)   #tag of a card code
+        self.start = -sum(self.tags) * (decks - 1)      #initial running count, 0 if balanced
+        super().__init__(decks, penetration, rng)
+
+    def shuffle(self) -> None:
+        super().shuffle()
+        self.running = self.start
+
+    def deal(self) -> int:
+        card = super().deal()
+        self.running += self.tags[card]
+        return card
+
+    def true_count(self, hidden: int = 0) -> float:
+        """Returns the running count per deck left in the shoe.
+
+        :hidden -> Leave out the last cards dealt, e.g. ROUND_CARDS to
+            get the count a bet should go by."""
+        first = max(self.pos - hidden, 0)
+        running = self.running
+        for card in self.cards[first:self.pos]:
+            running -= self.tags[card]
+        return running * 52 / (len(self.cards) - first)
+
+
+class CountingPolicy(StrategyPolicy):
+    """Plays basic strategy and bets more units as the true count rises."""
+
+    def __init__(self, shoe: CountingShoe, spread: Sequence[Tuple[int, int]] = SPREAD,
+        unit: int = 10, table: dict = BASIC_STRATEGY, hidden: int = ROUND_CARDS) -> None:
+        """Initializes necessary variables.
+
+        :shoe -> The counting shoe the game deals from.
+        :spread -> (true count, units) pairs in increasing order, the
+            units of the highest true count reached are bet, 1 below all.
+        :unit -> Amount of a unit bet.
+        :table -> Strategy table to play.
+        :hidden -> Cards dealt before the bet is asked for, 0 at a
+            blackJackTable.Table which takes the bets first."""
+        super().__init__(unit, table)
+        self.shoe = shoe
+        self.spread = tuple(spread)
+        self.hidden = hidden
+
+    def bet(self, entity: Player, amt: int) -> int:
+        count = self.shoe.true_count(self.hidden)
+        units = 1
+        for threshold, spread_units in self.spread:
+            if count < threshold:
+                break
+            units = spread_units
+        return min(self.unit * units, amt)
+
+
+def parse_spread(text: str) -> Tuple[Tuple[int, int], ...]:
+    """Turns 'count:units,...' as given on the command line into a spread."""
+    return tuple(tuple(int(n) for n in step.split(':')) for step in text.split(','))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate a card counter spreading bets.")
+    parser.add_argument('rounds', type=int, nargs='?', default=1_000_000)
+    parser.add_argument('--system', choices=list(COUNT_SYSTEMS), default='hilo')
+    parser.add_argument('--spread', type=parse_spread, default=SPREAD,
+        help="count:units pairs, e.g. 1:1,2:2,3:4,4:8,5:12")
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--penetration', type=float, default=0.75)
+    parser.add_argument('--seats', type=int, default=0,
+        help=f"play this many counters at a shared table of up to {MAX_SEATS} seats")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    shoe = CountingShoe(args.decks, args.penetration, rng, args.system)
+    if args.seats:
+        table = Table([CountingPolicy(shoe, args.spread, unit=1, hidden=0)
+            for _ in range(args.seats)], start_amount=10 ** 12, shoe=shoe, rng=rng)
+        play = lambda: table.play_round()
+    else:
+        game = BlackJack("counter", CountingPolicy(shoe, args.spread, unit=1),
+            start_amount=10 ** 12, shoe=shoe, rng=rng)
+        play = lambda: (game.play_round(),)
+    hands = args.rounds * max(args.seats, 1)
+    staked = net = 0
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for result in play():
+            staked += result.bet
+            net += result.net
+    elapsed = time.perf_counter() - start
+    print(f"{hands} hands in {elapsed:.1f}s ({hands / elapsed * 60:,.0f} per minute)")
+    print(f"Average bet {staked / hands:.3f} units, player net {net} units")
+    print(f"Player edge: {net / staked:.4%} of the money staked, {net / hands:.4f} units per hand")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Title: Blackjack hand history
+Description: An append-only log of settled rounds of blackJack.py. Every
+round is one fixed width binary record after a short header, so the log
+can be memory mapped and read as NumPy arrays without parsing anything. Writing only needs
+the standard library, NumPy is imported when a log is read.
+Tag: Game
+"""
+
+import argparse, os, struct
+from typing import Iterator
+
+from blackJack import MAX_HANDS, RoundResult, Rules, parse_rules
+
+# round number, initial bet, final stake, payout and total of each of
+# the player's hands (0 for the hands not played), dealer's total,
+# number of hands played, number of cards dealt, of them the dealer's
+# and number of moves, then the cards and moves themselves.
+RECORD = struct.Struct(f'<II{MAX_HANDS}I{MAX_HANDS}i{MAX_HANDS}B5Bx48s30s')
+CARD_SLOTS = 48                 #cards kept per record, a round deals far fewer
+MOVE_SLOTS = 30                 #moves kept per record
+NO_CARD = 0xFF                  #pads the unused card slots
+PADDING = (0,) * MAX_HANDS      #fills the slots of the hands not played
+
+# The log starts with a header: a magic number, the version of the
+# layout, the record size and the key of the rules the rounds were
+# played by, padded with NULs. Any other file is refused rather than
+# appended to or read.
+KEY_SLOTS = 64                  #header bytes kept for the rules key
+HEADER = struct.Struct(f'<4sHH{KEY_SLOTS}s')
+MAGIC = b'BJHL'
+LOG_VERSION = 2
+
+
+def record_dtype():
+    """Returns the NumPy dtype of a record, field for field the same as RECORD."""
+    import numpy as np
+
+    dtype = np.dtype([('round', '<u4'), ('bet', '<u4'), ('stake', '<u4', (MAX_HANDS,)),
+        ('payout', '<i4', (MAX_HANDS,)), ('total', 'u1', (MAX_HANDS,)),
+        ('dealer_total', 'u1'), ('n_hands', 'u1'), ('n_cards', 'u1'),
+        ('n_dealer', 'u1'), ('n_moves', 'u1'), ('_pad', 'V1'),
+        ('cards', 'u1', (CARD_SLOTS,)), ('moves', f'S{MOVE_SLOTS}')])
+    assert dtype.itemsize == RECORD.size
+    return dtype
+
+
+def log_header(rules: Rules = Rules()) -> bytes:
+    """Returns the header of a log of rounds played by the rules.
+
+    :rules -> The table rules."""
+    key = rules.key.encode()
+    if len(key) > KEY_SLOTS:
+        raise ValueError(f"The rules {rules.key} don't fit in a log header.")
+    return HEADER.pack(MAGIC, LOG_VERSION, RECORD.size, key)
+
+
+def check_header(header: bytes, path: str) -> Rules:
+    """Returns the rules a log was played by, read from its header.
+    Raises ValueError unless header is the header of a log of this
+    version.
+
+    :header -> The first bytes of the file.
+    :path -> The file, named in the error."""
+    if len(header) < HEADER.size or HEADER.unpack_from(header)[:3] != (MAGIC, LOG_VERSION, RECORD.size):
+        raise ValueError(f"{path} is not a version {LOG_VERSION} hand history log.")
+    return parse_rules(HEADER.unpack_from(header)[3].rstrip(b'\0').decode())
+
+
+def log_rules(path: str) -> Rules:
+    """Returns the rules the rounds of a log were played by.
+
+    :path -> The log file."""
+    with open(path, 'rb') as f:
+        return check_header(f.read(HEADER.size), path)
+
+
+class HandLog:
+    """Appends settled rounds to a log file. Records are packed into a
+    buffer and written a batch at a time, call flush or close (or use it
+    as a context manager) to write out the rest.
+
+    Pass the write method as the record hook of a game played by the
+    log's rules: BlackJack(name, policy, record=log.write, rules=rules)."""
+
+    def __init__(self, path: str, batch: int = 4096, rules: Rules = Rules()) -> None:
+        """Opens the log, creating it if needed. Raises ValueError if
+        the file exists but isn't a log of this version, or of rounds
+        played by other rules.
+
+        :path -> The log file.
+        :batch -> Rounds buffered before they are written.
+        :rules -> Rules the logged rounds are played by."""
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size:
+            logged = log_rules(path)
+            if logged != rules:
+                raise ValueError(f"{path} logs rounds played by {logged.key}, not {rules.key}.")
+            if (size - HEADER.size) % RECORD.size:
+                # the last write was cut short, drop the partial record
+                size -= (size - HEADER.size) % RECORD.size
+                os.truncate(path, size)
+        self.file = open(path, 'ab')
+        if not size:
+            self.file.write(log_header(rules))
+            self.file.flush()
+            size = HEADER.size
+        self.rounds = (size - HEADER.size) // RECORD.size     #rounds in the log, including buffered ones
+        self.batch = batch
+        self.buffer = bytearray(RECORD.size * batch)
+        self.pending = 0                            #rounds waiting in the buffer
+
+    def write(self, result: RoundResult) -> None:
+        """Appends a round to the log.
+
+        :result -> The round, as returned by BlackJack.play_round."""
+        if len(result.cards) > CARD_SLOTS or len(result.moves) > MOVE_SLOTS:
+            raise ValueError(f"A round of {len(result.cards)} cards and {len(result.moves)} "
+                "moves doesn't fit in a record.")
+        pad = PADDING[len(result.totals):]
+        RECORD.pack_into(self.buffer, self.pending * RECORD.size,
+            self.rounds, result.bet, *result.stakes, *pad, *result.payouts, *pad,
+            *result.totals, *pad, result.dealer_total, len(result.totals),
+            len(result.cards), result.dealer_cards, len(result.moves),
+            result.cards.ljust(CARD_SLOTS, bytes((NO_CARD,))),
+            result.moves.encode())
+        self.rounds += 1
+        self.pending += 1
+        if self.pending == self.batch:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes out the buffered rounds."""
+        if self.pending:
+            self.file.write(memoryview(self.buffer)[:self.pending * RECORD.size])
+            self.file.flush()
+            self.pending = 0
+
+    def close(self) -> None:
+        """Writes out the buffered rounds and closes the file."""
+        self.flush()
+        self.file.close()
+
+    def __enter__(self) -> 'HandLog':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_rounds(path: str, batch: int = 4096) -> Iterator[RoundResult]:
+    """Reads a log back one round at a time, without NumPy.
+
+    :path -> The log file.
+    :batch -> Rounds read from the file at once."""
+    with open(path, 'rb') as f:
+        check_header(f.read(HEADER.size), path)
+        while True:
+            data = f.read(RECORD.size * batch)
+            for fields in RECORD.iter_unpack(data[:len(data) - len(data) % RECORD.size]):
+                stakes = fields[2:2 + MAX_HANDS]
+                payouts = fields[2 + MAX_HANDS:2 + 2 * MAX_HANDS]
+                totals = fields[2 + 2 * MAX_HANDS:2 + 3 * MAX_HANDS]
+                dealer_total, n_hands, n_cards, n_dealer, n_moves, cards, moves = \
+                    fields[2 + 3 * MAX_HANDS:]
+                yield RoundResult(fields[1], sum(payouts), totals[:n_hands],
+                    dealer_total, stakes[:n_hands], payouts[:n_hands],
+                    cards[:n_cards], moves[:n_moves].decode(), n_dealer)
+            if len(data) < RECORD.size * batch:
+                return
+
+
+def read_log(path: str):
+    """Memory maps a log and returns it as a NumPy record array, one
+    element per round. Fields are read straight from the file as they
+    are used, e.g. log['payout'].sum() or log['cards'][log['n_hands'] > 1].
+
+    :path -> The log file."""
+    import numpy as np
+
+    dtype = record_dtype()
+    with open(path, 'rb') as f:
+        check_header(f.read(HEADER.size), path)
+    rounds = (os.path.getsize(path) - HEADER.size) // RECORD.size
+    if rounds == 0:
+        return np.zeros(0, dtype)                  #mmap can't map an empty file
+    return np.memmap(path, dtype, mode='r', offset=HEADER.size, shape=(rounds,))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Summarize a blackjack hand history log.")
+    parser.add_argument('path')
+    args = parser.parse_args()
+    log = read_log(args.path)
+    print(f"Rules: {log_rules(args.path).key}")
+    staked = int(log['bet'].sum(dtype='i8'))
+    net = int(log['payout'].sum(dtype='i8'))
+    print(f"{len(log)} rounds, ${staked} staked, player net ${net}")
+    print(f"Splits: {int((log['n_hands'] > 1).sum())}, busts: {int((log['total'][:, 0] > 21).sum())}")
+    if staked:
+        print(f"House edge: {-net / staked:.4%}")
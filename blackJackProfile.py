@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Title: Blackjack profiler
+Description: Counts and times the phases of a game of blackJack.py. The
+profiler replaces a game's phase methods with timed wrappers on the
+game instance only, so games that aren't profiled run the exact same
+code as before and pay nothing for it.
+Tag: Game
+"""
+
+import argparse, inspect, random, time
+from functools import wraps
+from typing import Callable, Dict, List
+
+from blackJack import BlackJack, Shoe, StrategyPolicy
+
+# phase -> BlackJack method timed for it. Timings are inclusive, a
+# round contains all the others and the player's turn the renders
+# done during it.
+PHASES = {
+    'round': 'round_steps',
+    'shuffle': 'shuffle',
+    'deal': 'deal',
+    'player': 'play_steps',
+    'dealer': 'dealer_play',
+    'settle': 'check_who_wins',
+    'render': 'display_scores',
+}
+BUCKETS = 64                    #histogram buckets, bucket n holds times under 2**n ns
+
+
+class PhaseProfiler:
+    """Collects a call count, total time and a histogram of call times
+    for each phase of the games it is attached to."""
+
+    def __init__(self, clock: Callable[[], int] = time.perf_counter_ns) -> None:
+        """Initializes necessary variables.
+
+        :clock -> Returns the time in nanoseconds."""
+        self.clock = clock
+        self.counts = dict.fromkeys(PHASES, 0)
+        self.totals = dict.fromkeys(PHASES, 0)         #nanoseconds spent in each phase
+        self.longest = dict.fromkeys(PHASES, 0)
+        self.histograms = {phase: [0] * BUCKETS for phase in PHASES}
+
+    def add(self, phase: str, elapsed: int) -> None:
+        """Records one call of a phase.
+
+        :phase -> One of PHASES.
+        :elapsed -> Time the call took, in nanoseconds."""
+        self.counts[phase] += 1
+        self.totals[phase] += elapsed
+        if elapsed > self.longest[phase]:
+            self.longest[phase] = elapsed
+        self.histograms[phase][min(elapsed.bit_length(), BUCKETS - 1)] += 1
+
+    def _wrap(self, phase: str, method: Callable) -> Callable:
+        """Returns method timed as phase. The steps of a round are
+        generators and are timed from their first step until they
+        finish, which for the server's AsyncBlackJack includes waiting
+        on the player."""
+        clock, add = self.clock, self.add
+        if inspect.isgeneratorfunction(method):
+            @wraps(method)
+            def timed(*args, **kwargs):
+                start = clock()
+                try:
+                    return (yield from method(*args, **kwargs))
+                finally:
+                    add(phase, clock() - start)
+        else:
+            @wraps(method)
+            def timed(*args, **kwargs):
+                start = clock()
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    add(phase, clock() - start)
+        return timed
+
+    def attach(self, game: BlackJack) -> BlackJack:
+        """Starts profiling a game and returns it.
+
+        :game -> The game to profile."""
+        for phase, name in PHASES.items():
+            setattr(game, name, self._wrap(phase, getattr(game, name)))
+        return game
+
+    def detach(self, game: BlackJack) -> None:
+        """Stops profiling a game, putting its own methods back.
+
+        :game -> A game the profiler was attached to."""
+        for name in PHASES.values():
+            game.__dict__.pop(name, None)
+
+    def reset(self) -> None:
+        """Forgets everything recorded so far."""
+        self.__init__(self.clock)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Returns what was recorded for each phase: the number of calls,
+        total, mean and longest time in seconds, and the histogram as a
+        {upper bound in ns: calls} dict of its non empty buckets."""
+        return {phase: {
+            'count': self.counts[phase],
+            'total': self.totals[phase] / 1e9,
+            'mean': self.totals[phase] / self.counts[phase] / 1e9 if self.counts[phase] else 0.0,
+            'max': self.longest[phase] / 1e9,
+            'histogram': {1 << bucket: calls
+                for bucket, calls in enumerate(self.histograms[phase]) if calls},
+        } for phase in PHASES}
+
+    def report(self) -> List[str]:
+        """Returns the snapshot as lines of a table."""
+        lines = [f"{'phase':<10}{'calls':>10}{'total s':>12}{'mean us':>12}{'max us':>12}"]
+        for phase, stats in self.snapshot().items():
+            lines.append(f"{phase:<10}{stats['count']:>10}{stats['total']:>12.3f}"
+                f"{stats['mean'] * 1e6:>12.2f}{stats['max'] * 1e6:>12.1f}")
+        return lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Profile the phases of headless blackjack rounds.")
+    parser.add_argument('rounds', type=int, nargs='?', default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--decks', type=int, default=6)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    profiler = PhaseProfiler()
+    game = profiler.attach(BlackJack("profile", StrategyPolicy(), start_amount=10 ** 12,
+        shoe=Shoe(args.decks, rng=rng), rng=rng))
+    for _ in range(args.rounds):
+        game.play_round()
+    print('\n'.join(profiler.report()))
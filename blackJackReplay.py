@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Title: Blackjack replay
+Description: Plays recorded rounds of blackJack.py again through the
+headless engine, feeding it the recorded bet, moves and cards, and
+checks the outcome matches the record. The cards come either from the
+record itself or from a shoe rebuilt from the seed the game was played
+with.
+Tag: Game
+"""
+
+import argparse, random
+from array import array
+from dataclasses import fields
+from typing import List, Optional, Tuple
+
+from blackJack import BlackJack, Entity, Player, Policy, RoundResult, Rules, Shoe
+from blackJackLog import log_rules, read_rounds
+
+BANKROLL = 10 ** 12         #start amount large enough that no recorded bet is refused
+
+
+class ReplayMismatch(Exception):
+    """Raised when a replayed round doesn't play out like its record."""
+
+
+class ReplayPolicy(Policy):
+    """Makes the recorded decisions of one round at a time."""
+
+    def __init__(self) -> None:
+        """Initializes necessary variables."""
+        self.amount = 0         #recorded bet
+        self.moves = ''         #recorded moves
+        self.next = 0           #index of the next move to make
+
+    def load(self, bet: int, moves: str) -> None:
+        """Sets up the decisions of the next round.
+
+        :bet -> The recorded bet.
+        :moves -> The recorded moves, in the order they were made."""
+        self.amount = bet
+        self.moves = moves
+        self.next = 0
+
+    def bet(self, entity: Player, amt: int) -> int:
+        return self.amount
+
+    def move(self, entity: Entity, upcard: int, moves: str) -> str:
+        if self.next == len(self.moves):
+            raise ReplayMismatch("The round asked for more moves than were recorded.")
+        move = self.moves[self.next]
+        self.next += 1
+        if move not in moves:
+            raise ReplayMismatch(f"Recorded move {move!r} isn't legal here, only {moves!r} are.")
+        return move
+
+
+class Replayer:
+    """Replays rounds one after the other through a headless BlackJack."""
+
+    def __init__(self, shoe: Optional[Shoe] = None, rules: Rules = Rules()) -> None:
+        """Initializes necessary variables.
+
+        :shoe -> Shoe to deal the replayed rounds from. By default each
+            round is dealt the cards of its record.
+        :rules -> Rules the recorded game was played by."""
+        self.policy = ReplayPolicy()
+        self.stacked = shoe is None                 #True if the records supply the cards
+        self.game = BlackJack("replay", self.policy, start_amount=BANKROLL,
+            shoe=shoe if shoe is not None else Shoe(1, 0), rules=rules)
+
+    @classmethod
+    def from_seed(cls, seed: int, rules: Rules = Rules(),
+        penetration: float = 0.75) -> 'Replayer':
+        """Returns a replayer dealing from the shoe of a game that was
+        started like blackJackRunner starts one, with a random.Random(seed)
+        shuffling the shoe and the start amount given. Rounds have to be
+        replayed from the game's first one on.
+
+        :seed -> Seed the game was played with.
+        :rules -> Rules the game was played by, their decks fill its shoe.
+        :penetration -> Penetration of the game's shoe."""
+        rng = random.Random(seed)
+        return cls(Shoe(rules.decks, penetration, rng), rules)
+
+    def replay(self, bet: int, moves: str, cards: Optional[bytes] = None) -> RoundResult:
+        """Plays a round with the given decisions and returns its result.
+
+        :bet -> Amount staked on the main hand.
+        :moves -> Moves to make, in order.
+        :cards -> Cards to deal in order, required unless the replayer
+            deals from its own shoe."""
+        if self.stacked:
+            if cards is None:
+                raise ValueError("This replayer has no shoe, the cards of the round are needed.")
+            shoe = self.game.shoe
+            shoe.cards = array('B', cards)
+            shoe.pos = 0
+            shoe.cut = len(cards) + 1           #never reshuffle over the stacked cards
+        self.policy.load(bet, moves)
+        self.game.start_amount = BANKROLL
+        result = self.game.play_round()
+        if self.policy.next != len(moves):
+            raise ReplayMismatch(f"The round ended with {len(moves) - self.policy.next} "
+                "recorded moves left.")
+        return result
+
+    def verify(self, record: RoundResult) -> RoundResult:
+        """Replays a recorded round and raises ReplayMismatch if it
+        plays out differently.
+
+        :record -> The recorded round."""
+        result = self.replay(record.bet, record.moves, record.cards)
+        if result != record:
+            diffs = ', '.join(f"{f.name} {getattr(record, f.name)!r} != {getattr(result, f.name)!r}"
+                for f in fields(RoundResult) if getattr(record, f.name) != getattr(result, f.name))
+            raise ReplayMismatch(f"Replayed round differs: {diffs}.")
+        return result
+
+
+def replay_log(path: str, replayer: Optional[Replayer] = None,
+    stop: int = 0) -> Tuple[int, List[Tuple[int, str]]]:
+    """Verifies every round of a hand history log. Returns the number of
+    rounds replayed and the (round number, reason) of each that didn't
+    match. Raises ValueError if the replayer plays by other rules than
+    the ones in the log's header.
+
+    :path -> The log file.
+    :replayer -> Replayer to use, by default the cards of each record
+        are dealt under the log's rules. A seeded replayer stops at the
+        first mismatch since its shoe is out of step from then on.
+    :stop -> Stop after this many mismatches, 0 never stops early."""
+    rules = log_rules(path)
+    replayer = replayer if replayer is not None else Replayer(rules=rules)
+    if replayer.game.rules != rules:
+        raise ValueError(f"{path} was played by {rules.key}, not {replayer.game.rules.key}.")
+    mismatches = []
+    rounds = 0
+    for rounds, record in enumerate(read_rounds(path), 1):
+        try:
+            replayer.verify(record)
+        except ReplayMismatch as e:
+            mismatches.append((rounds - 1, str(e)))
+            if not replayer.stacked or len(mismatches) == stop:
+                break
+    return rounds, mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay and verify a blackjack hand history log.")
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, help="deal from the game's seeded shoe instead of the logged cards")
+    parser.add_argument('--penetration', type=float, default=0.75)
+    args = parser.parse_args()
+    rules = log_rules(args.path)                #the rules are kept in the log's header
+    replayer = Replayer(rules=rules)
+    if args.seed is not None:
+        replayer = Replayer.from_seed(args.seed, rules, args.penetration)
+    rounds, mismatches = replay_log(args.path, replayer)
+    for number, reason in mismatches:
+        print(f"Round {number}: {reason}")
+    print(f"{rounds} rounds replayed, {len(mismatches)} mismatched.")
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Title: Blackjack random generators
+Description: Random generators for blackJack.py. Every generator here is
+a random.Random, so any of them can shuffle a Shoe or make a deck, but
+each draws its bits from a different source: the stdlib Mersenne
+Twister, a NumPy bit generator for fast simulations, or the operating
+system's CSPRNG for real tables. shuffled_shoes shuffles thousands of
+shoes at once for the batch simulator.
+Tag: Game
+"""
+
+import argparse, os, random, timeit, weakref
+from array import array
+from typing import Optional
+
+BIT_GENERATORS = {'pcg64': 'PCG64', 'philox': 'Philox', 'sfc64': 'SFC64'}   #NumPy bit generators by name
+WORD = 1 << 64                                                              #range of a 64 bit draw
+
+
+def numpy_generator(seed: Optional[int] = None, name: str = 'pcg64'):
+    """Returns a numpy.random.Generator using the named bit generator.
+
+    :seed -> Seed of the generator, random if not given.
+    :name -> One of BIT_GENERATORS."""
+    import numpy as np
+
+    if name not in BIT_GENERATORS:
+        raise ValueError(f"Unknown bit generator {name!r}, pick one of {', '.join(BIT_GENERATORS)}.")
+    return np.random.Generator(getattr(np.random, BIT_GENERATORS[name])(seed))
+
+
+class NumpyRandom(random.Random):
+    """A random.Random drawing from a NumPy bit generator. Shuffling a
+    deck of codes is done in place by NumPy in one call."""
+
+    def __init__(self, seed: Optional[int] = None, name: str = 'pcg64') -> None:
+        """Initializes necessary variables.
+
+        :seed -> Seed of the generator, random if not given.
+        :name -> One of BIT_GENERATORS."""
+        self.name = name
+        super().__init__(seed)
+
+    def seed(self, a: Optional[int] = None, version: int = 2) -> None:
+        self.gen = numpy_generator(a, self.name)
+
+    def random(self) -> float:
+        return self.gen.random()
+
+    def getrandbits(self, k: int) -> int:
+        return int.from_bytes(self.gen.bytes((k + 7) // 8), 'little') >> (-k % 8)
+
+    def shuffle(self, x) -> None:
+        if isinstance(x, array) and x.typecode == 'B':
+            import numpy as np
+            self.gen.shuffle(np.frombuffer(x, dtype=np.uint8))  #shuffles the array's own memory
+        else:
+            x[:] = [x[i] for i in self.gen.permutation(len(x))]
+
+    def getstate(self) -> dict:
+        return self.gen.bit_generator.state
+
+    def setstate(self, state: dict) -> None:
+        self.gen.bit_generator.state = state
+
+    def __reduce__(self) -> tuple:
+        # rebuild with the same bit generator, the seed is replaced by the state
+        return self.__class__, (0, self.name), self.getstate()
+
+
+_secure = weakref.WeakSet()         #SecureRandoms to empty when the process forks
+
+
+class SecureRandom(random.Random):
+    """A random.Random drawing from os.urandom, like random.SystemRandom,
+    but reading the bytes a buffer at a time instead of making a system
+    call per number. It can't be seeded and has no state to save. The
+    buffer is thrown away in a forked child so parent and child never
+    deal the same cards."""
+
+    def __init__(self, buffer_size: int = 4096) -> None:
+        """Initializes necessary variables.
+
+        :buffer_size -> Bytes read from the OS at a time."""
+        self.buffer_size = buffer_size
+        self.buffer = b''
+        self.pos = 0                #index of the next unused byte of buffer
+        super().__init__()
+        _secure.add(self)
+
+    def seed(self, a=None, version: int = 2) -> None:
+        pass                        #there is nothing to seed
+
+    def _bytes(self, n: int) -> bytes:
+        """Returns the next n random bytes."""
+        if self.pos + n > len(self.buffer):
+            self.buffer = self.buffer[self.pos:] + os.urandom(max(self.buffer_size, n))
+            self.pos = 0
+        self.pos += n
+        return self.buffer[self.pos - n:self.pos]
+
+    def random(self) -> float:
+        return (int.from_bytes(self._bytes(7), 'little') >> 3) * 2 ** -53
+
+    def getrandbits(self, k: int) -> int:
+        return int.from_bytes(self._bytes((k + 7) // 8), 'little') >> (-k % 8)
+
+    def shuffle(self, x) -> None:
+        # Fisher-Yates with the draws for every position read at once,
+        # a draw is only redone in the rare case it would bias the pick.
+        n = len(x)
+        draws = array('Q', self._bytes(8 * n))
+        for i in range(n - 1, 0, -1):
+            r = draws[i]
+            while r >= WORD - WORD % (i + 1):
+                r = int.from_bytes(self._bytes(8), 'little')
+            j = r % (i + 1)
+            x[i], x[j] = x[j], x[i]
+
+    def getstate(self):
+        raise NotImplementedError("A SecureRandom has no state to save.")
+
+    def setstate(self, state) -> None:
+        raise NotImplementedError("A SecureRandom has no state to restore.")
+
+    def _forget(self) -> None:
+        """Drops the buffered bytes."""
+        self.buffer = b''
+        self.pos = 0
+
+
+def _after_fork() -> None:
+    for rng in list(_secure):
+        rng._forget()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def make_rng(name: str = 'mt', seed: Optional[int] = None) -> random.Random:
+    """Returns a generator by name: 'mt' for random.Random, a key of
+    BIT_GENERATORS for a NumpyRandom or 'secure' for a SecureRandom.
+
+    :name -> Name of the generator.
+    :seed -> Seed of the generator, random if not given. A SecureRandom
+        can't be seeded."""
+    if name == 'mt':
+        return random.Random(seed)
+    if name == 'secure':
+        if seed is not None:
+            raise ValueError("The secure generator can't be seeded.")
+        return SecureRandom()
+    return NumpyRandom(seed, name)
+
+
+RNG_NAMES = ('mt', *BIT_GENERATORS, 'secure')
+
+
+def shuffled_shoes(n: int, decks: int = 6, rng=None, cards: Optional[int] = None):
+    """Returns n independently shuffled shoes of card codes as an
+    (n, cards) uint8 array, one shoe per row. Every shoe is shuffled at
+    once by sorting a row of random keys.
+
+    :n -> Number of shoes.
+    :decks -> Number of decks per shoe.
+    :rng -> numpy.random.Generator to draw the keys from, a fresh PCG64
+        by default.
+    :cards -> Only return the first cards of each shoe, which saves
+        sorting the keys of cards that wouldn't be used. Defaults to the
+        whole shoe."""
+    import numpy as np
+
+    rng = rng if rng is not None else numpy_generator()
+    shoe = np.tile(np.arange(52, dtype=np.uint8), decks)
+    keys = rng.random((n, shoe.size))
+    if cards is None or cards >= shoe.size:
+        return shoe[np.argsort(keys, axis=1)]
+    # partition off the cards with the smallest keys and sort just those
+    top = np.argpartition(keys, cards - 1, axis=1)[:, :cards]
+    return shoe[np.take_along_axis(top,
+        np.argsort(np.take_along_axis(keys, top, axis=1), axis=1), axis=1)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time shuffling a shoe with each generator.")
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--number', type=int, default=2_000)
+    args = parser.parse_args()
+    from blackJack import Shoe
+    for name in RNG_NAMES:
+        shoe = Shoe(args.decks, rng=make_rng(name))
+        per = timeit.timeit(shoe.shuffle, number=args.number) / args.number
+        print(f"{name:<8}{per * 1e6:>10.1f} us per shoe")
+    per = timeit.timeit(lambda: shuffled_shoes(1000, args.decks), number=10) / 10_000
+    print(f"{'bulk':<8}{per * 1e6:>10.1f} us per shoe")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Title: Blackjack Monte Carlo runner
+Description: Fans simulated rounds out over a process pool. The rounds
+are cut into fixed size blocks, each played with its own random stream
+derived from the master seed and the block number, so the merged totals
+are identical for a given seed no matter how many workers run them.
+Tag: Game
+"""
+
+import argparse, copy, hashlib, random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from blackJack import BlackJack, Policy, Rules, Shoe, StrategyPolicy, parse_rules
+from blackJackStrategy import load_strategy
+
+BANKROLL = 10 ** 12         #start amount large enough that no bet is ever refused
+
+
+@dataclass
+class Totals:
+    """Aggregate of simulated rounds. Everything is kept as integers so
+    merging totals in any order gives exactly the same result.
+
+    :rounds -> Number of rounds played.
+    :staked -> Sum of the initial bets.
+    :net -> Money won (positive) or lost (negative) by the player.
+    :won -> Rounds the player came out ahead.
+    :lost -> Rounds the player came out behind.
+    :pushed -> Rounds that broke even."""
+    rounds: int = 0
+    staked: int = 0
+    net: int = 0
+    won: int = 0
+    lost: int = 0
+    pushed: int = 0
+
+    @property
+    def house_edge(self) -> float:
+        """The house's expected win per unit staked."""
+        return -self.net / self.staked if self.staked else 0.0
+
+    def __add__(self, other: 'Totals') -> 'Totals':
+        return Totals(self.rounds + other.rounds, self.staked + other.staked,
+            self.net + other.net, self.won + other.won,
+            self.lost + other.lost, self.pushed + other.pushed)
+
+
+def block_seed(seed: int, block: int) -> int:
+    """Derives the seed of a block's random stream from the master seed.
+
+    :seed -> The master seed.
+    :block -> Number of the block."""
+    digest = hashlib.sha256(f"{seed}:{block}".encode()).digest()
+    return int.from_bytes(digest[:16], 'little')
+
+
+def _scalar_block(seed: int, rounds: int, policy: Policy, rules: Rules,
+    penetration: float) -> Totals:
+    """Plays a block of rounds through the headless BlackJack engine."""
+    rng = random.Random(seed)
+    game = BlackJack("runner", copy.deepcopy(policy), start_amount=BANKROLL,
+        shoe=Shoe(rules.decks, penetration, rng), rng=rng, rules=rules)
+    totals = Totals(rounds)
+    for _ in range(rounds):
+        result = game.play_round()
+        totals.staked += result.bet
+        totals.net += result.net
+        if result.net > 0:
+            totals.won += 1
+        elif result.net < 0:
+            totals.lost += 1
+        else:
+            totals.pushed += 1
+    return totals
+
+
+def _batch_block(seed: int, rounds: int, policy: Policy, rules: Rules,
+    penetration: float) -> Totals:
+    """Plays a block of rounds through the NumPy batch simulator. Only
+    the policy's strategy table and unit bet are used and every round
+    gets a fresh shoe."""
+    import numpy as np
+    from blackJackSim import compile_rules, compile_strategy, deal_cards, money_won, play_rounds
+
+    rng = np.random.default_rng(seed)
+    net = play_rounds(deal_cards(rounds, rules.decks, rng), compile_strategy(policy.table),
+        compile_rules(rules))[0]
+    net = money_won(net, np.full(rounds, policy.unit))
+    return Totals(rounds, rounds * policy.unit, int(net.sum()), int((net > 0).sum()),
+        int((net < 0).sum()), int((net == 0).sum()))
+
+
+ENGINES = {'scalar': _scalar_block, 'batch': _batch_block}
+
+
+def _run_block(task: tuple) -> Totals:
+    """Unpacks a task for the process pool."""
+    engine, *args = task
+    return ENGINES[engine](*args)
+
+
+def run(rounds: int, seed: int, workers: Optional[int] = None,
+    policy: Optional[Policy] = None, engine: str = 'scalar', rules: Rules = Rules(),
+    penetration: float = 0.75, block: int = 10_000) -> Totals:
+    """Simulates rounds over a pool of worker processes and returns the
+    merged totals.
+
+    :rounds -> Number of rounds to play.
+    :seed -> Master seed every block's random stream is derived from.
+    :workers -> Number of worker processes, defaults to the CPU count.
+        1 plays every block in this process.
+    :policy -> Policy every block starts a fresh copy of, defaults to
+        the rules' solved strategy betting the rules' whole_bet, so no
+        payout is rounded down. The batch engine only uses its table
+        and unit.
+    :engine -> 'scalar' for the BlackJack engine, 'batch' for the NumPy
+        simulator.
+    :rules -> The table rules.
+    :penetration -> Shoe penetration, ignored by the batch engine.
+    :block -> Rounds per block. Each block starts with a new shoe, so
+        changing it changes the results, unlike changing workers."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, pick one of {', '.join(ENGINES)}.")
+    policy = policy if policy is not None else StrategyPolicy(rules.whole_bet, load_strategy(rules))
+    tasks = [(engine, block_seed(seed, i), min(block, rounds - start), policy,
+        rules, penetration) for i, start in enumerate(range(0, rounds, block))]
+
+    totals = Totals()
+    if workers == 1:
+        for task in tasks:
+            totals += _run_block(task)
+        return totals
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(_run_block, tasks):
+            totals += result
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate rounds of blackjack over a process pool.")
+    parser.add_argument('rounds', type=int, nargs='?', default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--engine', choices=list(ENGINES), default='scalar')
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--block', type=int, default=10_000)
+    parser.add_argument('--rules', default='', help="rule variant, e.g. h17-das-es-bj3to2")
+    args = parser.parse_args()
+    rules = parse_rules(args.rules, Rules(args.decks))
+    policy = StrategyPolicy(unit=10, table=load_strategy(rules))
+    res = run(args.rounds, args.seed, args.workers, policy, args.engine, rules, block=args.block)
+    print(res)
+    print(f"House edge: {res.house_edge:.4%}")
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Title: Blackjack server
+Description: Hosts games of blackJack.py over TCP with asyncio. Every
+connection gets its own table, and all of them run in one process:
+a table waiting on its player's next bet or move just awaits the read
+instead of blocking the others.
+Play with e.g. `nc localhost 2121`.
+Tag: Game
+"""
+
+import argparse, asyncio
+from typing import Generator, Optional
+
+from blackJack import (BlackJack, Entity, MOVE_NAMES, Player, Policy, Rules, Shoe,
+    parse_rules)
+from blackJackStrategy import load_strategy
+
+
+class SessionClosed(Exception):
+    """Raised when a player quits, disconnects or idles for too long."""
+
+
+class Session:
+    """A player's connection, used for all of a table's I/O."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+        idle_timeout: Optional[float] = None) -> None:
+        """Initializes necessary variables.
+
+        :reader -> Stream the player's answers are read from.
+        :writer -> Stream the game is written to.
+        :idle_timeout -> Seconds to wait for an answer before the session
+            is closed, None waits forever."""
+        self.reader = reader
+        self.writer = writer
+        self.idle_timeout = idle_timeout
+
+    def echo(self, *args, sep: str = ' ', end: str = '\n') -> None:
+        """Drop in replacement for print that writes to the player."""
+        self.writer.write((sep.join(str(arg) for arg in args) + end).encode())
+
+    async def ask(self, prompt: str) -> str:
+        """Awaitable replacement for input.
+
+        :prompt -> Text shown before the player's answer."""
+        self.writer.write(prompt.encode())
+        await self.writer.drain()
+        try:
+            line = await asyncio.wait_for(self.reader.readline(), self.idle_timeout)
+        except asyncio.TimeoutError:
+            raise SessionClosed("idle") from None
+        if not line:
+            raise SessionClosed("disconnected")
+        return line.decode(errors='replace').strip()
+
+
+class RemotePolicy(Policy):
+    """Asks the player over their connection, the awaitable counterpart
+    of ConsolePolicy."""
+
+    def __init__(self, session: Session) -> None:
+        """Initializes necessary variables.
+
+        :session -> The player's connection."""
+        self.session = session
+
+    async def bet(self, entity: Player, amt: int) -> int:
+        """Asks for an amount to bet, or ends the session on (Q)uit."""
+        while True:                             #loop until player enters a valid amount.
+            self.session.echo(f"Enter an amount from $1 - ${amt} or press (Q)uit.")
+            answer = (await self.session.ask('> ')).upper()
+            if answer == 'Q':
+                self.session.echo("Thanks for playing.")
+                raise SessionClosed("quit")
+            try:
+                money_to_bet = int(answer)
+            except ValueError:
+                self.session.echo("Enter a valid amount.\n")        #Ask again, invalid input
+                continue
+            if 1 <= money_to_bet <= amt:
+                return money_to_bet
+            self.session.echo("Amount not within range.\n")
+
+    async def move(self, entity: Entity, upcard: int, moves: str) -> str:
+        """Asks for a move until a legal one is entered."""
+        prompt = ', '.join(MOVE_NAMES[m] for m in moves) + '> '
+        while True:
+            answer = (await self.session.ask(prompt)).upper()
+            if len(answer) == 1 and answer in moves:
+                return answer
+            self.session.echo("Enter a valid choice.")
+
+
+class AsyncBlackJack(BlackJack):
+    """A BlackJack whose decisions are awaited, so many tables can share
+    one event loop. Only reading the policy's answers differs, the bets,
+    moves and rounds are the plain BlackJack steps, and entity_bet,
+    entity_play, play_round and game return awaitables."""
+
+    async def decide(self, steps: Generator):
+        try:
+            request = next(steps)
+            while True:
+                ask, *args = request
+                request = steps.send(await getattr(self.policy, ask)(*args))
+        except StopIteration as done:
+            return done.value
+
+
+class Server:
+    """Accepts connections and runs a table for each of them."""
+
+    def __init__(self, rules: Rules = Rules(), idle_timeout: Optional[float] = 600,
+        hints: bool = False) -> None:
+        """Initializes necessary variables.
+
+        :rules -> The rules every table is played by.
+        :idle_timeout -> Seconds a player may take to answer.
+        :hints -> Show players the expected value of their moves. The
+            strategy table is loaded once and shared by every table."""
+        self.rules = rules
+        self.idle_timeout = idle_timeout
+        self.hints = load_strategy(rules) if hints else None
+        self.tables = 0                     #number of tables being played
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Runs a table for one connection until the player leaves."""
+        session = Session(reader, writer, self.idle_timeout)
+        self.tables += 1
+        try:
+            name = await session.ask("Blackjack, by Ede Chinedu\nEnter your name> ")
+            game = AsyncBlackJack(name[:20] or "Player", RemotePolicy(session),
+                echo=session.echo, shoe=Shoe(self.rules.decks), hints=self.hints, rules=self.rules)
+            await game.game()
+        except (SessionClosed, ConnectionError):
+            pass
+        finally:
+            self.tables -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 2121,
+        backlog: int = 1024) -> None:
+        """Serves tables until cancelled.
+
+        :host -> Address to listen on, localhost only by default.
+        :port -> Port to listen on.
+        :backlog -> Connections the OS may queue while players arrive
+            faster than they are accepted."""
+        server = await asyncio.start_server(self.handle, host, port, backlog=backlog)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve blackjack tables over TCP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2121)
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--rules', default='', help="rule variant, e.g. h17-das-es-bj3to2")
+    parser.add_argument('--hints', action='store_true', help="show the expected value of each move")
+    args = parser.parse_args()
+    try:
+        asyncio.run(Server(parse_rules(args.rules, Rules(args.decks)), hints=args.hints)
+            .serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Title: Blackjack batch simulator
+Description: Plays many independent rounds of blackJack.py at once with
+NumPy arrays. Every round gets its own freshly shuffled shoe, is played
+by a fixed strategy table and settled the same way BlackJack settles a
+round, under any variant of the rules. The player is assumed to always
+have the money to double or split unless told how many bets they cover.
+Bankrolls can be followed through many rounds too, each dealt from its
+own shoe, to estimate the risk of ruin of a bet sizing rule.
+Tag: Game
+"""
+
+import argparse
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from blackJack import ACE, BASIC_STRATEGY, MAX_HANDS, NO_DOUBLES, VALUES, Rules, parse_rules
+from blackJackCount import COUNT_SYSTEMS, SPREAD
+from blackJackRng import BIT_GENERATORS, numpy_generator, shuffled_shoes
+from blackJackStrategy import player_edge, solve
+
+MAX_CARDS = 32          #cards set aside per round, far more than a round ever uses
+
+# action codes of a compiled strategy table
+STAND, HIT, DOUBLE, DOUBLE_STAND, SURRENDER, SURRENDER_STAND = range(6)
+_ACTIONS = {'S': STAND, 'H': HIT, 'D': DOUBLE, 'd': DOUBLE_STAND,
+    'R': SURRENDER, 'r': SURRENDER_STAND}
+
+RANK_VALUES = np.frombuffer(VALUES[:13], dtype=np.uint8).astype(np.int16)  #value of a rank index
+# strategy table column of an upcard, by rank index
+UPCARD_COLUMNS = np.array([9 if value == 1 else value - 2 for value in VALUES[:13]])
+# pair table row of a pair, by rank index (aces are 11)
+PAIR_ROWS = np.array([11 if value == 1 else value for value in VALUES[:13]])
+
+
+@dataclass
+class BatchResult:
+    """Totals of a batch of simulated rounds, in units of the initial bet.
+
+    :rounds -> Number of rounds played.
+    :wagered -> Total staked, including doubles and splits.
+    :net -> Total won (positive) or lost (negative) by the player,
+        fractional when naturals pay more than even money or hands are
+        surrendered."""
+    rounds: int
+    wagered: int
+    net: float
+
+    @property
+    def house_edge(self) -> float:
+        """The house's expected win per initial bet."""
+        return -self.net / self.rounds if self.rounds else 0.0
+
+    def __add__(self, other: 'BatchResult') -> 'BatchResult':
+        return BatchResult(self.rounds + other.rounds,
+            self.wagered + other.wagered, self.net + other.net)
+
+
+def compile_strategy(table: dict = BASIC_STRATEGY) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Turns a strategy table laid out like BASIC_STRATEGY into arrays
+    that can be indexed by hand total (or pair value) and upcard column.
+
+    :table -> The strategy table to compile."""
+    hard = np.full((32, 10), STAND, dtype=np.int8)
+    hard[:4] = HIT
+    soft = np.full((32, 10), STAND, dtype=np.int8)
+    pair = np.zeros((12, 10), dtype=bool)
+    for rows, out in ((table['hard'], hard), (table['soft'], soft)):
+        for total, moves in rows.items():
+            out[total] = [_ACTIONS[move] for move in moves]
+    for value, moves in table['pair'].items():
+        pair[value] = [move == 'X' for move in moves]
+    return hard, soft, pair
+
+
+def compile_rules(rules: Rules = Rules()) -> tuple:
+    """Turns rules into the arrays and values play_rounds plays by: the
+    dealer hitting and the doubling tables as [soft, value] arrays, the
+    doubling table of a split hand, the hands a player may split into,
+    whether surrender is allowed and what a natural pays, 0 if naturals
+    aren't paid.
+
+    :rules -> The table rules."""
+    doubles = np.array(rules.doubles())
+    return (np.array(rules.dealer_hits()), doubles,
+        doubles if rules.double_after_split else np.array(NO_DOUBLES),
+        rules.max_hands, rules.surrender,
+        rules.blackjack_pays[0] / rules.blackjack_pays[1] if rules.blackjack_pays else 0.0)
+
+
+def money_won(net: np.ndarray, bets: np.ndarray) -> np.ndarray:
+    """Returns what each round won in money for the given bets, rounded
+    down to whole money like BlackJack does for naturals and surrenders.
+
+    :net -> Net win of each round, in units of the initial bet.
+    :bets -> Initial bet of each round."""
+    return np.floor(net * bets + 1e-6).astype(np.int64)     #a hair over so 1.2 * 5 is still 6
+
+
+def deal_cards(n: int, decks: int, rng: np.random.Generator) -> np.ndarray:
+    """Deals the first MAX_CARDS rank indices of n rounds, one round per
+    row. Each shuffled shoe is cut into as many rounds of MAX_CARDS
+    cards as it holds, so a shoe's keys are drawn and sorted once for
+    several rounds. Rounds cut from the same shoe aren't independent,
+    but each is dealt exactly like the start of a fresh shoe, so totals
+    and averages are unbiased.
+
+    :n -> Number of rounds.
+    :decks -> Number of decks per shoe.
+    :rng -> NumPy random generator."""
+    per_shoe = 52 * decks // MAX_CARDS
+    shoes = shuffled_shoes(-(-n // per_shoe), decks, rng, per_shoe * MAX_CARDS)
+    return shoes.reshape(-1, MAX_CARDS)[:n] % 13
+
+
+def _totals(hard: np.ndarray, aces: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized Entity.get_hand_value, returns hand values and soft flags."""
+    soft = aces & (hard + 10 <= 21)
+    return np.where(soft, hard + 10, hard), soft
+
+
+def play_rounds(cards: np.ndarray, strategy: Optional[tuple] = None,
+    rules: Optional[tuple] = None,
+    covers: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Plays one round per row of cards in lockstep. Cards are dealt
+    from the front of each row: two to the player, two to the dealer
+    (the second is the upcard), then hits in the order BlackJack deals
+    them. Returns the net win, amount wagered and number of cards used
+    by each round, in units of the initial bet.
+
+    :cards -> Rank indices, one row per round.
+    :strategy -> Compiled strategy table, defaults to BASIC_STRATEGY.
+    :rules -> Rules compiled by compile_rules, defaults to the default rules.
+    :covers -> Initial bets each round's money covers, like the engine a
+        hand is only doubled or split if one more bet is covered. No
+        limit by default."""
+
+    hard_tab, soft_tab, pair_tab = strategy if strategy is not None else compile_strategy()
+    dealer_hits, doubles, split_doubles, max_hands, surrender, natural_pays = \
+        rules if rules is not None else compile_rules()
+    n, width = cards.shape
+    covers = covers if covers is not None else np.full(n, np.iinfo(np.int64).max)
+    values = RANK_VALUES[cards]
+    pos = np.full(n, 4)                                 #index of the next card to deal
+
+    def draw(rows: np.ndarray) -> np.ndarray:
+        """Deals the next card to each of the given rounds."""
+        card = cards[rows, np.minimum(pos[rows], width - 1)]
+        pos[rows] += 1
+        return card
+
+    # a slot per hand the player could split into, like BlackJack.hands
+    hard = np.zeros((n, MAX_HANDS), dtype=np.int16)
+    aces = np.zeros((n, MAX_HANDS), dtype=bool)
+    bets = np.zeros((n, MAX_HANDS), dtype=np.int16)
+    pairs = np.zeros((n, MAX_HANDS, 2), dtype=cards.dtype)     #first two cards of each hand
+    pairs[:, 0] = cards[:, :2]
+    n_hands = np.ones(n, dtype=np.int64)
+    bets[:, 0] = 1
+    dealer_hard = values[:, 2] + values[:, 3]
+    dealer_aces = (cards[:, 2] == ACE) | (cards[:, 3] == ACE)
+    column = UPCARD_COLUMNS[cards[:, 3]]
+    # naturals, never dealt if the rules don't pay them
+    natural = (values[:, 0] + values[:, 1] == 11) & ((cards[:, 0] == ACE) | (cards[:, 1] == ACE)) \
+        & bool(natural_pays)
+    dealer_natural = (dealer_hard == 11) & dealer_aces & bool(natural_pays)
+    surrendered = np.zeros(n, dtype=bool)
+
+    # player's turn, one hand after the other like entity_play
+    for hand in range(max_hands):
+        # split while the hand is a pair the table splits, the new hand
+        # takes the second card and the next card, then this hand gets
+        # the card after that.
+        while True:
+            rows = np.nonzero((bets[:, hand] > 0) & (n_hands < max_hands)
+                & (pairs[:, hand, 0] == pairs[:, hand, 1]) & (bets.sum(axis=1) < covers))[0]
+            rows = rows[pair_tab[PAIR_ROWS[pairs[rows, hand, 0]], column[rows]]]
+            if rows.size == 0:
+                break
+            new = n_hands[rows]
+            pairs[rows, new, 0] = pairs[rows, hand, 1]
+            pairs[rows, new, 1] = draw(rows)
+            pairs[rows, hand, 1] = draw(rows)
+            bets[rows, new] = 1
+            n_hands[rows] += 1
+        hard[:, hand] = RANK_VALUES[pairs[:, hand, 0]] + RANK_VALUES[pairs[:, hand, 1]]
+        aces[:, hand] = (pairs[:, hand, 0] == ACE) | (pairs[:, hand, 1] == ACE)
+
+        # only a hand's first move may double or surrender, and only
+        # the first hand, before any split, may surrender
+        active = bets[:, hand] > 0
+        if hand == 0:
+            active &= ~natural                  #a natural stands without a move
+        unsplit = n_hands == 1
+        double_tab = np.where(unsplit[:, None, None], doubles, split_doubles)
+        can_double = bets.sum(axis=1) < covers
+        can_surrender = unsplit & surrender if hand == 0 else np.zeros(n, dtype=bool)
+        while True:
+            rows = np.nonzero(active)[0]
+            if rows.size == 0:
+                break
+            total, soft = _totals(hard[rows, hand], aces[rows, hand])
+            col = column[rows]
+            total = np.minimum(total, 31)
+            action = np.where(soft, soft_tab[total, col], hard_tab[total, col])
+            doubling = can_double[rows] & double_tab[rows, soft.astype(np.intp), total] \
+                & ((action == DOUBLE) | (action == DOUBLE_STAND))
+            giving_up = can_surrender[rows] & ((action == SURRENDER) | (action == SURRENDER_STAND))
+            action[(action == DOUBLE) & ~doubling] = HIT
+            action[(action == DOUBLE_STAND) & ~doubling] = STAND
+            action[(action == SURRENDER) & ~giving_up] = HIT
+            action[(action == SURRENDER_STAND) & ~giving_up] = STAND
+            action[total > 21] = STAND                  #bust, the hand is over
+            can_double[rows] = False
+            can_surrender[rows] = False
+            surrendered[rows[giving_up]] = True
+
+            hitting = rows[(action == HIT) | doubling]
+            card = draw(hitting)
+            hard[hitting, hand] += RANK_VALUES[card]
+            aces[hitting, hand] |= card == ACE
+            bets[rows[doubling], hand] = 2
+            active[rows[action != HIT]] = False
+
+    # dealer's turn, only played if a hand is still standing
+    player_total = _totals(hard, aces)[0]
+    live = (player_total <= 21) & (bets > 0)
+    live[:, 0] &= ~surrendered
+    playing = live.any(axis=1)
+    while True:
+        dealer_total, dealer_soft = _totals(dealer_hard, dealer_aces)
+        rows = np.nonzero(playing & dealer_hits[dealer_soft.astype(np.intp),
+            np.minimum(dealer_total, 31)])[0]
+        if rows.size == 0:
+            break
+        card = draw(rows)
+        dealer_hard[rows] += RANK_VALUES[card]
+        dealer_aces[rows] |= card == ACE
+
+    # settle each hand like check_who_wins, a natural beats any other
+    # 21 and the dealer's natural beats any other hand
+    dealer_total = dealer_total[:, None]
+    won = live & ((dealer_total > 21) | (player_total > dealer_total))
+    won[:, 0] |= natural & ~dealer_natural
+    lost = (bets > 0) & ~live | live & (dealer_total <= 21) & (player_total < dealer_total)
+    lost |= live & (dealer_natural & ~natural)[:, None]
+    net = (bets * won).sum(axis=1) - (bets * lost).sum(axis=1) \
+        + (natural_pays - 1) * (natural & ~dealer_natural) + 0.5 * surrendered
+    return net, bets.sum(axis=1), pos
+
+
+def simulate(rounds: int, rules: Rules = Rules(), seed: Optional[int] = None,
+    table: Optional[dict] = None, chunk: int = 50_000,
+    generator: str = 'pcg64') -> BatchResult:
+    """Plays rounds independent rounds in batches and returns the totals.
+
+    :rounds -> Number of rounds to play.
+    :rules -> The table rules.
+    :seed -> Seed for the random generator, random if not given.
+    :table -> Strategy table laid out like BASIC_STRATEGY, defaults to
+        the basic strategy of the rules.
+    :chunk -> Rounds played per batch, bounds memory use.
+    :generator -> NumPy bit generator, one of blackJackRng.BIT_GENERATORS."""
+    rng = numpy_generator(seed, generator)
+    strategy = compile_strategy(table if table is not None else solve(rules))
+    compiled = compile_rules(rules)
+    result = BatchResult(0, 0, 0.0)
+    while result.rounds < rounds:
+        n = min(chunk, rounds - result.rounds)
+        net, wagered, _ = play_rounds(deal_cards(n, rules.decks, rng), strategy, compiled)
+        result += BatchResult(n, int(wagered.sum()), float(net.sum()))
+    return result
+
+
+# a bet sizer returns the bet of each bankroll given the bankrolls and
+# the true counts the bets are placed at
+BetSizer = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+def flat_bets(unit: int = 1) -> BetSizer:
+    """Bets the same amount every round.
+
+    :unit -> The amount bet."""
+    def sizer(money: np.ndarray, count: np.ndarray) -> np.ndarray:
+        return np.full(money.shape, unit, dtype=np.int64)
+    return sizer
+
+
+def count_bets(spread: Sequence[Tuple[int, int]] = SPREAD, unit: int = 1) -> BetSizer:
+    """Bets more units as the true count rises, like blackJackCount.CountingPolicy.
+
+    :spread -> (true count, units) pairs in increasing order.
+    :unit -> Amount of a unit bet."""
+    thresholds = np.array([threshold for threshold, _ in spread])
+    units = np.array([1] + [units for _, units in spread], dtype=np.int64) * unit
+    def sizer(money: np.ndarray, count: np.ndarray) -> np.ndarray:
+        return units[np.searchsorted(thresholds, count, side='right')]
+    return sizer
+
+
+def kelly_bets(fraction: float = 0.5, edge: Optional[float] = None, per_count: float = 0.005,
+    variance: float = 1.3, unit: int = 1, rules: Rules = Rules()) -> BetSizer:
+    """Bets a fraction of the Kelly bet, the bankroll times the expected
+    edge over the variance of a round, or one unit when the edge isn't
+    positive. The edge is estimated from the true count.
+
+    :fraction -> Fraction of the Kelly bet, 1 is full Kelly.
+    :edge -> Player's edge at a true count of 0, by default the
+        blackJackStrategy.player_edge of the rules, about -2.7% under the
+        default rules since blackjack only pays even money.
+    :per_count -> Edge gained per point of true count.
+    :variance -> Variance of a round, in squared bets.
+    :unit -> The smallest bet.
+    :rules -> The table rules, only used to work out the edge."""
+    edge = edge if edge is not None else player_edge(rules)
+    def sizer(money: np.ndarray, count: np.ndarray) -> np.ndarray:
+        advantage = np.maximum(edge + per_count * count, 0.0)
+        return np.maximum((fraction * money * advantage / variance).astype(np.int64), unit)
+    return sizer
+
+
+BET_SIZERS = {'flat': flat_bets, 'count': count_bets, 'kelly': kelly_bets}
+
+
+@dataclass
+class BankrollResult:
+    """Outcome of simulated bankroll trajectories, one element per trajectory.
+
+    :rounds -> Rounds each trajectory played at most.
+    :final -> Bankroll at the end, or when ruined.
+    :ruined_at -> Round the bankroll fell below the minimum bet, -1 if never.
+    :max_drawdown -> Largest fall of the bankroll from a previous peak."""
+    rounds: int
+    final: np.ndarray
+    ruined_at: np.ndarray
+    max_drawdown: np.ndarray
+
+    @property
+    def risk_of_ruin(self) -> float:
+        """Fraction of the trajectories that were ruined."""
+        return float((self.ruined_at >= 0).mean())
+
+    @property
+    def median_hands_to_ruin(self) -> float:
+        """Median round of ruin of the ruined trajectories, nan if none were."""
+        ruined = self.ruined_at[self.ruined_at >= 0]
+        return float(np.median(ruined)) if ruined.size else float('nan')
+
+    def drawdown_quantiles(self, quantiles: Sequence[float] = (0.5, 0.9, 0.99)) -> np.ndarray:
+        """Returns quantiles of the maximum drawdowns.
+
+        :quantiles -> The quantiles to return, from 0 to 1."""
+        return np.quantile(self.max_drawdown, quantiles)
+
+
+def _fresh_shoes(n: int, decks: int, rng: np.random.Generator) -> np.ndarray:
+    """Shuffles n shoes of rank indices, with MAX_CARDS more cards behind
+    each for a round that outlasts the shoe, like Shoe.deal does."""
+    return np.concatenate((shuffled_shoes(n, decks, rng),
+        shuffled_shoes(n, decks, rng, MAX_CARDS)), axis=1) % 13
+
+
+def simulate_bankrolls(trajectories: int, rounds: int, bankroll: int,
+    sizer: Optional[BetSizer] = None, rules: Rules = Rules(), penetration: float = 0.75,
+    seed: Optional[int] = None, table: Optional[dict] = None, min_bet: Optional[int] = None,
+    max_bet: Optional[int] = None, system: str = 'hilo',
+    generator: str = 'pcg64') -> BankrollResult:
+    """Plays rounds for many bankrolls in lockstep. Each bankroll is
+    dealt from its own shoe, reshuffled once the cut card comes out, and
+    keeps its own true count for the sizer. Bets are rounded down to a
+    multiple of the rules' whole_bet, so every payout is whole money. A
+    bankroll is ruined once it can't cover the minimum bet.
+
+    :trajectories -> Number of bankrolls.
+    :rounds -> Rounds played by each bankroll.
+    :bankroll -> Money each bankroll starts with.
+    :sizer -> Bet sizing rule, flat bets of min_bet by default.
+    :rules -> The table rules.
+    :penetration -> Fraction of each shoe dealt before it is reshuffled.
+    :seed -> Seed for the random generator, random if not given.
+    :table -> Strategy table laid out like BASIC_STRATEGY, defaults to
+        the basic strategy of the rules.
+    :min_bet -> Table minimum, a multiple of the rules' whole_bet,
+        defaults to the whole_bet.
+    :max_bet -> Table maximum, a multiple of the whole_bet no lower than
+        min_bet, none by default.
+    :system -> Count the true count is kept with, one of
+        blackJackCount.COUNT_SYSTEMS.
+    :generator -> NumPy bit generator, one of blackJackRng.BIT_GENERATORS."""
+    whole = rules.whole_bet
+    min_bet = min_bet if min_bet is not None else whole
+    if min_bet % whole:
+        raise ValueError(f"A minimum bet of {min_bet} can't be paid in whole money, "
+            f"bets must be multiples of {whole}.")
+    if max_bet is not None and (max_bet < min_bet or max_bet % whole):
+        raise ValueError(f"A maximum bet of {max_bet} must be a multiple of {whole} "
+            f"no lower than the minimum bet of {min_bet}.")
+    rng = numpy_generator(seed, generator)
+    strategy = compile_strategy(table if table is not None else solve(rules))
+    compiled = compile_rules(rules)
+    decks = rules.decks
+    sizer = sizer if sizer is not None else flat_bets(min_bet)
+    tags = np.array([COUNT_SYSTEMS[system][VALUES[rank] - 1] for rank in range(13)])
+    start = -int(tags.sum()) * 4 * (decks - 1)             #initial running count, like CountingShoe's
+    size = 52 * decks
+    cut = int(size * penetration)
+    window = np.arange(MAX_CARDS)
+
+    shoes = _fresh_shoes(trajectories, decks, rng)
+    pos = np.zeros(trajectories, dtype=np.int64)            #next card of each shoe
+    running = np.full(trajectories, start, dtype=np.int64)  #running count of each shoe
+    money = np.full(trajectories, bankroll, dtype=np.int64)
+    peak = money.copy()
+    max_drawdown = np.zeros(trajectories, dtype=np.int64)
+    ruined_at = np.full(trajectories, -1, dtype=np.int64)
+    rows = np.nonzero(money >= min_bet)[0]                  #bankrolls still playing
+    ruined_at[money < min_bet] = 0
+
+    for n in range(1, rounds + 1):
+        if rows.size == 0:
+            break
+        shuffle = rows[pos[rows] >= cut]
+        if shuffle.size:
+            shoes[shuffle] = _fresh_shoes(shuffle.size, decks, rng)
+            pos[shuffle] = 0
+            running[shuffle] = start
+
+        count = running[rows] * 52 / (size - pos[rows])
+        bets = np.clip(sizer(money[rows], count), min_bet, money[rows])
+        if max_bet is not None:
+            bets = np.minimum(bets, max_bet)
+        bets -= bets % whole
+        cards = shoes[rows[:, None], pos[rows, None] + window]
+        net, _, used = play_rounds(cards, strategy, compiled, money[rows] // bets)
+
+        money[rows] += money_won(net, bets)
+        running[rows] += (tags[cards] * (window < used[:, None])).sum(axis=1)
+        pos[rows] += used
+        peak[rows] = np.maximum(peak[rows], money[rows])
+        max_drawdown[rows] = np.maximum(max_drawdown[rows], peak[rows] - money[rows])
+
+        broke = money[rows] < min_bet
+        ruined_at[rows[broke]] = n
+        rows = rows[~broke]
+    return BankrollResult(rounds, money, ruined_at, max_drawdown)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate rounds of blackjack in batches.")
+    parser.add_argument('rounds', type=int, nargs='?', default=1_000_000)
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--generator', choices=list(BIT_GENERATORS), default='pcg64')
+    parser.add_argument('--rules', default='', help="rule variant, e.g. h17-das-es-bj3to2")
+    parser.add_argument('--bankroll', type=int, help="follow bankrolls of this size instead")
+    parser.add_argument('--trajectories', type=int, default=10_000)
+    parser.add_argument('--bets', choices=list(BET_SIZERS), default='flat')
+    args = parser.parse_args()
+    rules = parse_rules(args.rules, Rules(args.decks))
+    if args.bankroll is not None:
+        sizer = kelly_bets(rules=rules) if args.bets == 'kelly' else BET_SIZERS[args.bets]()
+        res = simulate_bankrolls(args.trajectories, args.rounds, args.bankroll,
+            sizer, rules, seed=args.seed, generator=args.generator)
+        print(f"{args.trajectories} bankrolls of ${args.bankroll}, {args.rounds} rounds each")
+        print(f"Risk of ruin: {res.risk_of_ruin:.2%}, median hands to ruin: {res.median_hands_to_ruin:.0f}")
+        print("Max drawdown 50/90/99%: " + ', '.join(f"${q:.0f}" for q in res.drawdown_quantiles()))
+        raise SystemExit
+    res = simulate(args.rounds, rules, args.seed, generator=args.generator)
+    print(f"{res.rounds} rounds of {rules.key}, ${res.wagered} wagered, player net ${res.net:.1f}")
+    print(f"House edge: {res.house_edge:.4%}")
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Title: Blackjack strategy
+Description: Exact probabilities and expected values for the rules of
+blackJack.py, for any variant of them a Rules can describe. A
+composition is a tuple of ten counts, how many aces, twos, ... nines
+and ten valued cards are left in the shoe.
+Tag: Game
+"""
+
+import json, os, tempfile
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+from blackJack import Rules
+
+OUTCOMES = (17, 18, 19, 20, 21, 'bust', 'blackjack')    #dealer final totals, in distribution order
+BUST = 5                                    #index of a bust in a distribution
+NATURAL = 6                                 #index of a natural, only dealt when naturals are paid
+SOLVER_VERSION = 3                          #bump to invalidate cached strategy tables
+
+
+def full_composition(decks: int) -> Tuple[int, ...]:
+    """Returns the composition of a freshly shuffled shoe.
+
+    :decks -> Number of decks in the shoe."""
+    return (4 * decks,) * 9 + (16 * decks,)
+
+
+def remove_card(composition: Tuple[int, ...], value: int) -> Tuple[int, ...]:
+    """Returns the composition left once a card has been dealt from it.
+
+    :composition -> Composition to deal from.
+    :value -> Value of the dealt card, 1 for an ace."""
+    if composition[value - 1] == 0:
+        raise ValueError(f"No card of value {value} left to remove.")
+    return composition[:value - 1] + (composition[value - 1] - 1,) + composition[value:]
+
+
+@lru_cache(maxsize=1 << 20)
+def _dealer_draw(hard: int, ace: bool, composition: Tuple[int, ...],
+    hit_soft_17: bool = False) -> Tuple[float, ...]:
+    """Distribution of the dealer's final total from a hand with the
+    given hard total, drawing from composition."""
+    total = hard + 10 if ace and hard + 10 <= 21 else hard
+    if total > 17 or total == 17 and not (hit_soft_17 and total != hard):
+        result = [0.0] * 7
+        result[BUST if total > 21 else total - 17] = 1.0
+        return tuple(result)
+
+    left = sum(composition)
+    if left == 0:
+        raise ValueError("The shoe ran out before the dealer reached 17.")
+    result = [0.0] * 7
+    for value in range(1, 11):
+        count = composition[value - 1]
+        if not count:
+            continue
+        p = count / left
+        drawn = _dealer_draw(hard + value, ace or value == 1,
+            remove_card(composition, value), hit_soft_17)
+        for i in range(7):
+            result[i] += p * drawn[i]
+    return tuple(result)
+
+
+@lru_cache(maxsize=1 << 16)
+def dealer_distribution(upcard: int, composition: Tuple[int, ...],
+    hit_soft_17: bool = False, naturals: bool = False) -> Tuple[float, ...]:
+    """Returns the exact probability of each of the dealer's final totals
+    17, 18, 19, 20, 21, bust and a natural, in that order. The hole card
+    is drawn from composition too, since the dealer doesn't peek for
+    blackjack.
+
+    :upcard -> Value of the dealer's face up card, 1 for an ace.
+    :composition -> The cards left in the shoe, upcard already removed.
+    :hit_soft_17 -> True if the dealer hits a soft 17.
+    :naturals -> True if a natural is told apart from other 21s."""
+    if not (naturals and upcard in (1, 10)):
+        return _dealer_draw(upcard, upcard == 1, composition, hit_soft_17)
+    # draw the hole card here to catch the naturals
+    result = [0.0] * 7
+    left = sum(composition)
+    for value in range(1, 11):
+        count = composition[value - 1]
+        if not count:
+            continue
+        p = count / left
+        if upcard + value == 11 and 1 in (upcard, value):
+            result[NATURAL] += p
+            continue
+        drawn = _dealer_draw(upcard + value, upcard == 1 or value == 1,
+            remove_card(composition, value), hit_soft_17)
+        for i in range(7):
+            result[i] += p * drawn[i]
+    return tuple(result)
+
+
+def clear_cache() -> None:
+    """Forgets every memoized distribution and expected value."""
+    _dealer_draw.cache_clear()
+    dealer_distribution.cache_clear()
+    _stand.cache_clear()
+    _best.cache_clear()
+
+
+@lru_cache(maxsize=1 << 18)
+def _stand(total: int, upcard: int, composition: Tuple[int, ...],
+    dealer: Tuple[bool, bool] = (False, False)) -> float:
+    """Expected value of standing on total against the dealer drawing
+    from composition. dealer holds the hit_soft_17 and naturals flags
+    of dealer_distribution, as do the functions below. A natural isn't
+    an ordinary 21, _natural values it."""
+    if total > 21:
+        return -1.0
+    dealer = dealer_distribution(upcard, composition, *dealer)
+    ev = dealer[BUST] - dealer[NATURAL]
+    for i, dealer_total in enumerate(OUTCOMES[:BUST]):
+        if total > dealer_total:
+            ev += dealer[i]
+        elif total < dealer_total:
+            ev -= dealer[i]
+    return ev
+
+
+def _natural(upcard: int, composition: Tuple[int, ...], pays: float,
+    hit_soft_17: bool = False) -> float:
+    """Expected value of standing on a natural that pays pays times the
+    bet, a push against the dealer's natural."""
+    return pays * (1 - dealer_distribution(upcard, composition, hit_soft_17, True)[NATURAL])
+
+
+def _draws(composition: Tuple[int, ...], deplete: bool = True):
+    """Yields the value, probability and composition left of each card
+    that can be drawn from composition. Unless deplete, the composition
+    is left as it is, so every draw has the odds of the first."""
+    left = sum(composition)
+    for value, count in enumerate(composition, 1):
+        if count:
+            yield value, count / left, remove_card(composition, value) if deplete else composition
+
+
+def _hit(hard: int, ace: bool, upcard: int, composition: Tuple[int, ...],
+    dealer: Tuple[bool, bool] = (False, False), deplete: bool = True) -> float:
+    """Expected value of hitting once from composition, then playing on
+    optimally with hits and stands only."""
+    return sum(p * _best(hard + value, ace or value == 1, upcard, rest, dealer, deplete)
+        for value, p, rest in _draws(composition, deplete))
+
+
+@lru_cache(maxsize=1 << 18)
+def _best(hard: int, ace: bool, upcard: int, composition: Tuple[int, ...],
+    dealer: Tuple[bool, bool] = (False, False), deplete: bool = True) -> float:
+    """Expected value of the best of hitting and standing, memoized by
+    hand and composition so every hand reached by several orders of
+    draws is only worked out once."""
+    total = _total(hard, ace)
+    if total > 21:
+        return -1.0
+    return max(_stand(total, upcard, composition, dealer),
+        _hit(hard, ace, upcard, composition, dealer, deplete))
+
+
+def _double(hard: int, ace: bool, upcard: int, composition: Tuple[int, ...],
+    dealer: Tuple[bool, bool] = (False, False), deplete: bool = True) -> float:
+    """Expected value of doubling, one card from composition then a
+    stand for twice the bet."""
+    return 2 * sum(p * _stand(_total(hard + value, ace or value == 1), upcard, rest, dealer)
+        for value, p, rest in _draws(composition, deplete))
+
+
+def _split(card: int, upcard: int, composition: Tuple[int, ...],
+    dealer: Tuple[bool, bool] = (False, False), doubles: Optional[tuple] = None,
+    deplete: bool = True) -> float:
+    """Expected value of splitting a pair of card. Each hand is dealt
+    one card and valued as if it were played alone, hitting and standing
+    only, or doubling first if doubles, the Rules.doubles table of a
+    split hand, allows it. There is no resplitting."""
+    ev = 0.0
+    for value, p, rest in _draws(composition, deplete):
+        hard, ace = card + value, card == 1 or value == 1
+        hand = _best(hard, ace, upcard, rest, dealer, deplete)
+        total = _total(hard, ace)
+        if doubles is not None and doubles[total != hard][total]:
+            hand = max(hand, _double(hard, ace, upcard, rest, dealer, deplete))
+        ev += p * hand
+    return 2 * ev
+
+
+class _Solver:
+    """Expected values of a hand against one dealer upcard. The dealer's
+    distribution is exact for the shoe less the upcard, the player's
+    draws use the probabilities of that same shoe, which makes every
+    value depend on the hand's total only, as basic strategy does."""
+
+    def __init__(self, upcard: int, composition: Tuple[int, ...], rules: Rules = Rules()) -> None:
+        """Initializes necessary variables.
+
+        :upcard -> Value of the dealer's face up card, 1 for an ace.
+        :composition -> The shoe the upcard was dealt from.
+        :rules -> The table rules."""
+        self.upcard = upcard
+        self.composition = remove_card(composition, upcard)
+        self.dealer = (rules.hit_soft_17, rules.blackjack_pays is not None)
+        self.pays = rules.blackjack_pays[0] / rules.blackjack_pays[1] if rules.blackjack_pays else None
+        self.split_doubles = rules.doubles() if rules.double_after_split else None
+
+    def stand(self, total: int) -> float:
+        """Expected value of standing on total."""
+        return _stand(total, self.upcard, self.composition, self.dealer)
+
+    def natural(self) -> float:
+        """Expected value of standing on a natural, an ordinary soft 21
+        if the rules don't pay naturals."""
+        if self.pays is None:
+            return self.stand(21)
+        return _natural(self.upcard, self.composition, self.pays, self.dealer[0])
+
+    def hit(self, hard: int, ace: bool) -> float:
+        """Expected value of hitting once, then playing on optimally
+        with hits and stands only."""
+        return _hit(hard, ace, self.upcard, self.composition, self.dealer, False)
+
+    def double(self, hard: int, ace: bool) -> float:
+        """Expected value of doubling, one card then a stand for twice the bet."""
+        return _double(hard, ace, self.upcard, self.composition, self.dealer, False)
+
+    def split(self, value: int) -> float:
+        """Expected value of splitting a pair of value."""
+        return _split(value, self.upcard, self.composition, self.dealer, self.split_doubles, False)
+
+
+def composition_evs(hand: Sequence[int], upcard: int, composition: Tuple[int, ...],
+    moves: str = 'HSDX', rules: Rules = Rules(), split: bool = False) -> Dict[str, float]:
+    """Returns the expected value of each of the moves for a hand, in
+    units of the bet, with every card drawn from the exact composition
+    given rather than from a full shoe. Doubling, splitting and
+    surrendering are only valued for a two card hand, and standing on
+    a natural the rules pay is valued at its payout. The two hands of
+    a split are valued as if each were played alone, hitting and
+    standing only, or doubling first if the rules allow it.
+
+    :hand -> Values of the player's cards, 1 for an ace.
+    :upcard -> Value of the dealer's face up card, 1 for an ace.
+    :composition -> Cards not yet seen, the dealer's hole card among
+        them, e.g. Shoe.composition() with the hole card added back.
+    :moves -> Letters of the moves to value, as from legal_moves.
+    :rules -> The table rules.
+    :split -> True if the hand is one of a split, whose two card 21
+        isn't a natural."""
+    dealer = (rules.hit_soft_17, rules.blackjack_pays is not None)
+    hard, ace = sum(hand), 1 in hand
+    evs = {}
+    if 'H' in moves:
+        evs['H'] = _hit(hard, ace, upcard, composition, dealer)
+    if 'S' in moves and rules.blackjack_pays and len(hand) == 2 and hard == 11 and ace and not split:
+        evs['S'] = _natural(upcard, composition,
+            rules.blackjack_pays[0] / rules.blackjack_pays[1], rules.hit_soft_17)
+    elif 'S' in moves:
+        evs['S'] = _stand(_total(hard, ace), upcard, composition, dealer)
+    if 'D' in moves and len(hand) == 2:
+        evs['D'] = _double(hard, ace, upcard, composition, dealer)
+    if 'X' in moves and len(hand) == 2 and hand[0] == hand[1]:
+        evs['X'] = _split(hand[0], upcard, composition, dealer,
+            rules.doubles() if rules.double_after_split else None)
+    if 'R' in moves and len(hand) == 2:
+        evs['R'] = -0.5
+    return evs
+
+
+def _total(hard: int, ace: bool) -> int:
+    """Value of a hand, counting an ace as 11 if it doesn't bust."""
+    return hard + 10 if ace and hard + 10 <= 21 else hard
+
+
+def _pick(stand: float, hit: float, double: float, can_double: bool = True,
+    surrender: bool = False) -> str:
+    """Strategy table letter for the best of stand, hit, double and,
+    if the rules allow it, surrender."""
+    if not can_double:
+        double = float('-inf')
+    if surrender and -0.5 > max(stand, hit, double):
+        return 'R' if hit >= stand else 'r'
+    if double > max(stand, hit):
+        return 'D' if hit >= stand else 'd'
+    return 'H' if hit > stand else 'S'
+
+
+def solve(rules: Rules = Rules()) -> dict:
+    """Computes the basic strategy table, laid out like
+    blackJack.BASIC_STRATEGY, for a set of rules. The expected value of
+    every move is kept under 'ev', in units of the bet: for hard and
+    soft totals a (stand, hit, double) triple per upcard column, for
+    pairs the value of splitting and under 'natural' the value of
+    standing on a natural per upcard column. Doubling is valued even
+    where the rules don't allow it, the letters never pick it there.
+
+    :rules -> The table rules."""
+    composition = full_composition(rules.decks)
+    solvers = [_Solver(upcard, composition, rules) for upcard in (2, 3, 4, 5, 6, 7, 8, 9, 10, 1)]
+    doubles = rules.doubles()
+    table = {'hard': {}, 'soft': {}, 'pair': {},
+        'ev': {'hard': {}, 'soft': {}, 'pair': {}, 'natural': [s.natural() for s in solvers]}}
+
+    for kind, totals in (('hard', range(4, 22)), ('soft', range(12, 22))):
+        for total in totals:
+            hard, ace = (total - 10, True) if kind == 'soft' else (total, False)
+            evs = [[s.stand(total), s.hit(hard, ace), s.double(hard, ace)] for s in solvers]
+            table[kind][total] = ''.join(_pick(*ev, doubles[kind == 'soft'][total], rules.surrender)
+                for ev in evs)
+            table['ev'][kind][total] = evs
+
+    for value in range(2, 12):
+        card = 1 if value == 11 else value
+        hard, ace = 2 * card, card == 1
+        total = _total(hard, ace)
+        evs = [s.split(card) for s in solvers]
+        others = []                 #best the pair can do without splitting, per upcard
+        for stand, hit, double in table['ev']['soft' if ace else 'hard'][total]:
+            options = [stand, hit]
+            if doubles[ace][total]:
+                options.append(double)
+            if rules.surrender:
+                options.append(-0.5)
+            others.append(max(options))
+        table['pair'][value] = ''.join('X' if rules.max_hands > 1 and ev > other else '-'
+            for ev, other in zip(evs, others))
+        table['ev']['pair'][value] = evs
+    return table
+
+
+def player_edge(rules: Rules = Rules(), table: Optional[dict] = None) -> float:
+    """Returns the player's expected value per initial bet of a round
+    dealt from a full shoe and played by basic strategy, negative when
+    the house has the edge. Like solve, every card is drawn with the
+    odds of the full shoe.
+
+    :rules -> The table rules.
+    :table -> Solved strategy table of the rules, loaded if not given."""
+    ev = (table if table is not None else load_strategy(rules))['ev']
+    doubles = rules.doubles()
+    composition = full_composition(rules.decks)
+    odds = [count / sum(composition) for count in composition]
+    edge = 0.0
+    for column, upcard in enumerate((2, 3, 4, 5, 6, 7, 8, 9, 10, 1)):
+        for first in range(1, 11):
+            for second in range(1, 11):
+                hard, ace = first + second, 1 in (first, second)
+                total = _total(hard, ace)
+                if rules.blackjack_pays is not None and hard == 11 and ace:
+                    best = ev['natural'][column]
+                else:
+                    stand, hit, double = ev['soft' if total != hard else 'hard'][total][column]
+                    options = [stand, hit]
+                    if doubles[total != hard][total]:
+                        options.append(double)
+                    if rules.surrender:
+                        options.append(-0.5)
+                    if first == second and rules.max_hands > 1:
+                        options.append(ev['pair'][11 if first == 1 else first][column])
+                    best = max(options)
+                edge += odds[upcard - 1] * odds[first - 1] * odds[second - 1] * best
+    return edge
+
+
+def rules_key(rules: Rules = Rules()) -> str:
+    """Name of the rule set a strategy table was solved for, used to
+    key the cache.
+
+    :rules -> The table rules."""
+    return f"v{SOLVER_VERSION}-{rules.key}"
+
+
+def default_cache_dir() -> str:
+    """Directory strategy tables are cached in."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'blackjack')
+
+
+_loaded: Dict[str, dict] = {}       #tables already loaded by this process
+
+
+def _int_keys(table: dict) -> dict:
+    """JSON turns the totals into strings, turn them back."""
+    return {kind: {int(k): v for k, v in rows.items()} if isinstance(rows, dict) else rows
+        for kind, rows in table.items()}
+
+
+def _write_cache(path: str, table: dict) -> None:
+    """Writes a solved table to the cache. A cache that can't be written
+    is skipped, the table is only solved again by the next process."""
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first so a reader never sees half a table
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(table, f)
+        os.replace(tmp, path)
+    except OSError:
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_strategy(rules: Rules = Rules(), cache_dir: Optional[str] = None) -> dict:
+    """Returns the basic strategy table for the rules, solving it and
+    writing it to the cache the first time, if the cache can be written.
+
+    :rules -> The table rules.
+    :cache_dir -> Directory of the cache, defaults to default_cache_dir()."""
+    key = rules_key(rules)
+    if key in _loaded:
+        return _loaded[key]
+
+    path = os.path.join(cache_dir or default_cache_dir(), f"strategy-{key}.json")
+    try:
+        with open(path) as f:
+            raw = json.load(f)
+        table = _int_keys({k: v for k, v in raw.items() if k != 'ev'})
+        table['ev'] = _int_keys(raw['ev'])
+    except (OSError, ValueError, KeyError):
+        table = solve(rules)
+        _write_cache(path, table)
+    _loaded[key] = table
+    return table
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Title: Blackjack table
+Description: A table of up to seven players dealt from one shoe by one
+dealer. Each seat is a headless game of blackJack.py sharing the
+table's shoe and dealer, so the seats deplete the same cards, the dealer
+plays out their hand once per round and every seat is settled against
+it in one pass.
+Tag: Game
+"""
+
+import argparse, random, time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from blackJack import BlackJack, Dealer, Policy, RoundResult, Rules, Shoe, StrategyPolicy, parse_rules
+from blackJackStrategy import load_strategy
+
+MAX_SEATS = 7               #seats at a table
+
+
+class Table:
+    """A blackjack table. Bets are taken before the cards are dealt,
+    then every seat gets a card, the dealer gets one, every seat gets a
+    second and the dealer their second. The seats play their hands in
+    turn before the dealer's single play-out. A seat whose money has
+    run out sits the round out."""
+
+    def __init__(self, policies: Sequence[Policy], start_amount: Optional[int] = None,
+        shoe: Optional[Shoe] = None,
+        rng: Optional[random.Random] = None,
+        record: Optional[Callable[[RoundResult], None]] = None,
+        names: Optional[Sequence[str]] = None,
+        rules: Rules = Rules()) -> None:
+        """Initializes necessary variables.
+
+        :policies -> The policy of each seat, 1 to MAX_SEATS of them.
+        :start_amount -> Money each seat starts with, randomized per
+            seat if not given.
+        :shoe -> The shoe to deal from, defaults to one of the rules' decks.
+        :rng -> Random generator for the start amounts and the default
+            shoe, defaults to the random module.
+        :record -> Called with the RoundResult of every seat that
+            played a round, in seat order.
+        :names -> Name of each seat, 'seat1' and so on by default.
+        :rules -> The table rules."""
+        if not 1 <= len(policies) <= MAX_SEATS:
+            raise ValueError(f"A table has 1 to {MAX_SEATS} seats, not {len(policies)}.")
+        if names is None:
+            names = [f"seat{n}" for n in range(1, len(policies) + 1)]
+        self.shoe = shoe if shoe is not None else Shoe(rules.decks, rng=rng)
+        self.dealer = Dealer([])
+        self.record = record
+        self.seats = [BlackJack(name, policy, start_amount, shoe=self.shoe, rng=rng,
+            rules=rules) for name, policy in zip(names, policies)]
+        for seat in self.seats:
+            seat.dealer = self.dealer               #every seat plays against the table's dealer
+        self.shuffles = 0                           #shuffles since the table opened
+        self.play_outs = 0                          #rounds the dealer had to play out
+
+    def shuffle(self) -> None:
+        """Gathers the cards back into the shoe and shuffles it."""
+        self.shoe.shuffle()
+        self.shuffles += 1
+
+    def deal(self, seats: List[BlackJack], bets: List[int]) -> List[bytes]:
+        """Deals fresh hands to the seats and the dealer and returns the
+        two cards each seat was dealt.
+
+        :seats -> The seats playing the round.
+        :bets -> What each of them staked."""
+        shoe = self.shoe
+        for seat in seats:
+            seat.clear()
+        first = [shoe.deal() for _ in seats]
+        dealer_first = shoe.deal()
+        dealt = []
+        for seat, card, bet in zip(seats, first, bets):
+            seat.player.reset((card, shoe.deal()))
+            seat.player.money = bet
+            dealt.append(bytes(seat.player.hand))
+        self.dealer.reset((dealer_first, shoe.deal()))
+        return dealt
+
+    def play_round(self) -> Tuple[Optional[RoundResult], ...]:
+        """Plays a round at every seat and returns the result of each,
+        None for a seat that sat out. The cards of a seat's result are
+        its own and the dealer's, in the order a game of its own would
+        have dealt them, so it replays like one. A seat whose hands all
+        went bust or were surrendered is settled before the dealer plays
+        out for the others, as a game of its own would never have drawn
+        the dealer's cards."""
+
+        shoe = self.shoe
+        if shoe.cut_reached():
+            self.shuffle()
+        playing = [n for n, seat in enumerate(self.seats) if seat.start_amount >= 1]
+        results: List[Optional[RoundResult]] = [None] * len(self.seats)
+        if not playing:
+            return tuple(results)
+        seats = [self.seats[n] for n in playing]
+        bets = [seat.entity_bet(seat.player, seat.start_amount) for seat in seats]
+        dealt = self.deal(seats, bets)
+        dealer_dealt = bytes(self.dealer.hand)
+
+        # each seat plays all its hands before the next seat's turn,
+        # so the cards a seat drew follow each other in the shoe
+        drawn = []
+        for seat in seats:
+            start = shoe.pos
+            hand = 0
+            while hand < seat.n_hands:
+                seat.entity_play(seat.hands[hand])
+                hand += 1
+            drawn.append(shoe.cards[start:shoe.pos].tobytes())
+
+        # a seat with no live hand is settled against the dealer's two
+        # cards, and the dealer only plays out if some hand at the
+        # table is still live
+        live = [any(hand.is_live() for hand in seat.hands[:seat.n_hands]) for seat in seats]
+
+        def settle(settling: bool, dealer_drawn: bytes) -> None:
+            """Settles the seats that have a live hand, or that don't."""
+            for n, seat, bet, cards, seat_drawn, seat_live in zip(playing, seats, bets, dealt, drawn, live):
+                if seat_live == settling:
+                    payouts = tuple([seat.check_who_wins(hand) for hand in seat.hands[:seat.n_hands]])
+                    results[n] = seat.round_result(bet, payouts,
+                        cards + dealer_dealt + seat_drawn + dealer_drawn)
+
+        settle(False, b'')
+        start = shoe.pos
+        if any(live):
+            seats[0].dealer_play()
+            self.play_outs += 1
+        settle(True, shoe.cards[start:shoe.pos].tobytes())
+
+        if self.record is not None:
+            for result in results:
+                if result is not None:
+                    self.record(result)
+        return tuple(results)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Simulate basic strategy players sharing a table.")
+    parser.add_argument('rounds', type=int, nargs='?', default=100_000)
+    parser.add_argument('--seats', type=int, default=MAX_SEATS)
+    parser.add_argument('--decks', type=int, default=6)
+    parser.add_argument('--penetration', type=float, default=0.75)
+    parser.add_argument('--rules', default='', help="rule variant, e.g. h17-das-es-bj3to2")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    rules = parse_rules(args.rules, Rules(args.decks))
+    strategy = load_strategy(rules)
+    rng = random.Random(args.seed)
+    table = Table([StrategyPolicy(10, strategy) for _ in range(args.seats)], start_amount=10 ** 12,
+        shoe=Shoe(rules.decks, args.penetration, rng), rng=rng, rules=rules)
+    staked = [0] * args.seats
+    net = [0] * args.seats
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for n, result in enumerate(table.play_round()):
+            staked[n] += result.bet
+            net[n] += result.net
+    elapsed = time.perf_counter() - start
+    hands = args.rounds * args.seats
+    print(f"{args.rounds} rounds, {hands} seat hands in {elapsed:.1f}s ({hands / elapsed * 60:,.0f} per minute)")
+    print(f"{hands / max(table.shuffles, 1):.1f} seat hands per shuffle, "
+        f"{hands / max(table.play_outs, 1):.2f} per dealer play-out")
+    for n in range(args.seats):
+        print(f"{table.seats[n].player_name}: player edge {net[n] / staked[n]:.4%}")
+    print(f"Table: player edge {sum(net) / sum(staked):.4%}")